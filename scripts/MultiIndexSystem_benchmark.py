@@ -0,0 +1,65 @@
+from timeit import timeit
+
+from index_table import IndexTable
+from lectures import MultiIndexSystem
+
+Index = MultiIndexSystem.DocIndex
+N = 10 ** 5
+TYPES = ['lecture', 'lab', 'homework', 'exam']
+REPEAT = 20
+
+# synthetic indices, interleaved types, in creation order
+all_indices = [Index((TYPES[i % len(TYPES)], i // len(TYPES) + 1))
+               for i in range(N)]
+documents = {index: object() for index in all_indices}
+table = IndexTable(all_indices)
+
+start, end = Index(('lecture', N // 8)), Index(('lecture', N // 8 + 50))
+cross_start, cross_end = Index(('lab', N // 8)), Index(('exam', N // 8 + 50))
+
+
+# the linear scans used before the index table
+
+def linear_lookup(index):
+    for other in documents:
+        if other == index:
+            return documents[other]
+
+
+def linear_range(start, end):
+    return [i for i in all_indices if i[0] == start[0] and i[1] >= start[1] and i[1] <= end[1]]
+
+
+def linear_cross_range(start, end):
+    return all_indices[all_indices.index(start):all_indices.index(end)+1]
+
+
+def linear_filter(ls):
+    return [l for l in ls if l in all_indices]
+
+
+cases = [
+    ('lookup by index',
+     lambda: linear_lookup(end),
+     lambda: documents.get(end)),
+    ('same-type range',
+     lambda: linear_range(start, end),
+     lambda: MultiIndexSystem.range(table, start, end)),
+    ('cross-type range',
+     lambda: linear_cross_range(cross_start, cross_end),
+     lambda: MultiIndexSystem.range(table, cross_start, cross_end)),
+    ('membership filter',
+     lambda: linear_filter(linear_range(start, end)),
+     lambda: [l for l in MultiIndexSystem.range(table, start, end) if l in table]),
+]
+
+if __name__ == '__main__':
+    print('{} indices, best of {} runs'.format(N, REPEAT))
+    print('building the index table: {:8.2f} ms'.format(
+        timeit(lambda: IndexTable(all_indices), number=1) * 1000))
+    for name, before, after in cases:
+        assert before() == after()
+        t_before = min(timeit(before, number=1) for _ in range(REPEAT))
+        t_after = min(timeit(after, number=1) for _ in range(REPEAT))
+        print('{:<20} {:10.3f} ms -> {:8.4f} ms  ({:,.0f}x)'.format(
+            name, t_before * 1000, t_after * 1000, t_before / t_after))
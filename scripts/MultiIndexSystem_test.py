@@ -1,4 +1,5 @@
 from lectures import MultiIndexSystem
+from range_query import RangeError
 
 Index = MultiIndexSystem.DocIndex
 i = Index(('lecture', 1))
@@ -8,6 +9,16 @@ current_indices = [Index(('lecture', 1)),
                    Index(('lecture', 2)),
                    Index(('lecture', 3))]
 
+
+
+def should_fail(string, indices):
+    try:
+        print('should fail', MultiIndexSystem.match_range(string, indices))
+    except RangeError as e:
+        print('fails as expected:', e)
+    else:
+        raise AssertionError('{!r} should fail'.format(string))
+
 # test creating new indices
 
 print(MultiIndexSystem.new_index( current_indices,'lecture'))
@@ -81,7 +92,7 @@ print(MultiIndexSystem.match_range('   lecture 1-7   ', current_indices, ))
 
 print(MultiIndexSystem.match_range('  1- lab 7   ', current_indices, ))
 
-print('should fail', MultiIndexSystem.match_range('  lecture 2 - lab 7   ', current_indices, ))
+should_fail('  lecture 2 - lab 7   ', current_indices)
 # this case should fail.
 
 print(MultiIndexSystem.match_range('  lecture 2 - lab 2   ', current_indices, ))
@@ -105,7 +116,7 @@ print(MultiIndexSystem.match_range('lecture first - lecture 3', current_indices,
 print(MultiIndexSystem.match_range('lecture first - lab last', current_indices, ))
 print(MultiIndexSystem.match_range('lab first - lecture last', current_indices, ))
 print(MultiIndexSystem.match_range('lab first - lecture 4', current_indices, ))
-print('should fail', MultiIndexSystem.match_range('lab first - lecture 3', current_indices, ))
+should_fail('lab first - lecture 3', current_indices)
 
 # test complex range with 'first'
 
@@ -115,13 +126,13 @@ print(MultiIndexSystem.match_range(' 2 - lecture last', current_indices, ))
 print(MultiIndexSystem.match_range(' first - lecture 3', current_indices, ))
 print(MultiIndexSystem.match_range('lab first - last', current_indices, ))
 print(MultiIndexSystem.match_range('lab first - lecture 4', current_indices, ))
-print('should fail', MultiIndexSystem.match_range('lab first - lecture', current_indices, ))
+should_fail('lab first - lecture', current_indices)
 
 # test complex range with 'all'
 
 print(MultiIndexSystem.match_range('lecture all', current_indices, ))
 print(MultiIndexSystem.match_range('all lecture', current_indices, ))
-print('should fail',MultiIndexSystem.match_range(' all first lecture', current_indices, ))
+should_fail(' all first lecture', current_indices)
 print(MultiIndexSystem.match_range(' all', current_indices, ))
 
 # test reversing arguments in each clause
@@ -1,7 +1,10 @@
 import logging
+import os
 import sys
-from typing import List
+from pathlib import Path
+from typing import Iterator, List, Optional
 
+from stat_cache import stat_key
 from utils import cut_string
 
 
@@ -60,40 +63,93 @@ class Action(Loggable, MenuItem):
         raise NotImplementedError()
 
 
+def fingerprint(path: Path) -> tuple:
+    'The stat key of path itself and of what it points to, None where it does not exist.'
+    keys = []
+    for stat in (os.lstat, os.stat):
+        try:
+            keys.append(stat_key(stat(path)))
+        except OSError:
+            keys.append(None)
+    return tuple(keys)
+
+
 class Service(Loggable, Describable):
+    ''' A source of menu items.
+
+    The suggested actions are memoized: a service that declares the files
+    they depend on, through `dependencies`, only builds them again once
+    one of those files changed.'''
+
     def __init__(self, name):
         super().__init__()
         self.name = name
         self.actions = []
         self.hint_word = []
+        self._dependency_key = None
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def suggested_actions(self):
         raise NotImplementedError()
 
+    def dependencies(self) -> Optional[List[Path]]:
+        ''' The files and directories the suggested actions are built from.
+        A directory changes when a file is added to it or removed, a symlink
+        when it is pointed elsewhere. None, the default, means that the
+        actions are built again every time.'''
+        return None
+
+    def dependency_key(self) -> Optional[tuple]:
+        try:
+            dependencies = self.dependencies()
+        except Exception:
+            return None
+        if dependencies is None:
+            return None
+        return tuple(fingerprint(path) for path in dependencies)
+
+    @property
+    def cache_stats(self) -> dict:
+        return {'hits': self.cache_hits, 'misses': self.cache_misses}
+
     def __str__(self):
         return self.name + ' ' + self.description + ' ' + str(self.actions)
 
     def get_displayed_menuitems(self, include_hint=True) -> List[MenuItem]:
-        try:
-            new_actions = self.suggested_actions()
-            assert isinstance(new_actions, list)
-            self.actions = new_actions
-        except NotImplementedError:
-            self.actions = []
-        except:
-            self.logger.warning(
-                'Failed to load suggested actions for service {}'.format(self.name))
-            pass
-
-        if include_hint and self.hint_word:
-            # add a empty action according to hint word
-            hint_prompt = ' '.join(self.hint_word)
-            hint_action = MenuItem(hint_prompt, hint_prompt)
-            hint_action.description = self.__doc__
-            return self.actions + [hint_action]
+        key = self.dependency_key()
+        if key is not None and key == self._dependency_key:
+            self.cache_hits += 1
+        else:
+            if key is not None:
+                self.cache_misses += 1
+            self._dependency_key = None
+            try:
+                new_actions = self.suggested_actions()
+                assert isinstance(new_actions, list)
+                self.actions = new_actions
+                self._dependency_key = key
+            except NotImplementedError:
+                self.actions = []
+            except:
+                self.logger.warning(
+                    'Failed to load suggested actions for service {}'.format(self.name))
+                pass
+
+        if include_hint:
+            return self.actions + self.hint_menuitems()
         else:
             return self.actions
 
+    def hint_menuitems(self) -> List[MenuItem]:
+        'An empty action according to the hint word, if there is one.'
+        if not self.hint_word:
+            return []
+        hint_prompt = ' '.join(self.hint_word)
+        hint_action = MenuItem(hint_prompt, hint_prompt)
+        hint_action.description = self.__doc__
+        return [hint_action]
+
     def make_custom_action(self, args: list):
         raise NotImplementedError()
 
@@ -109,14 +165,34 @@ class Service(Loggable, Describable):
         except NotImplementedError:
             pass
 
+    def iter_displayed_menuitems(self) -> Iterator[MenuItem]:
+        ''' The displayed menu items, as they become available. A service
+        that gathers its items from slow sources yields the first ones early.'''
+        yield from self.get_displayed_menuitems()
+
     def execute(self):
         from choose import Choose
-        available_menuitems = self.get_displayed_menuitems()
+        available_menuitems = []  # filled as the options are shown
+
+        def options():
+            for menuitem in self.iter_displayed_menuitems():
+                available_menuitems.append(menuitem)
+                yield menuitem.display_name
 
-        options = [action.display_name for action in available_menuitems]
         # options += [' '.join(self.hint_word)]
         returncode, index, selected = Choose.run(
-            'Select option', options, [])
+            'Select option', options(), [])
+        return self.handle_selection(available_menuitems, returncode, index, selected)
+
+    @staticmethod
+    def options(menuitems: List[MenuItem]) -> List[str]:
+        'The lines shown in the menu for menuitems.'
+        return [action.display_name for action in menuitems]
+
+    def handle_selection(self, available_menuitems: List[MenuItem], returncode, index: int, selected: str):
+        ''' Execute what was chosen in the menu of available_menuitems,
+        given the result of `Choose.run`.'''
+        from choose import Choose
         # parse the result, send to service process
 
         if returncode is Choose.CODE.SELECTED:
@@ -137,6 +213,55 @@ class Service(Loggable, Describable):
                             menuitem.display_name, menuitem.description)).execute()
 
 
+class PromptTrie():
+    ''' The services of a menu by their hint words, one token per level, to
+    find the services a typed prompt is meant for without asking each of
+    them. Services that cannot make a custom action are left out.'''
+
+    def __init__(self, services: List[Service]):
+        self.root = {}  # token -> node, and None -> [(position, service)]
+        for position, service in enumerate(services):
+            if not isinstance(service, Service) or \
+                    type(service).make_custom_action is Service.make_custom_action:
+                continue
+            node = self.root
+            for token in service.hint_word:
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append((position, service))
+
+    def services(self, args: List[str]) -> List[Service]:
+        'The services whose hint words start args, in registration order.'
+        found = list(self.root.get(None, []))
+        node = self.root
+        for token in args:
+            node = node.get(token)
+            if node is None:
+                break
+            found += node.get(None, [])
+        return [service for _, service in sorted(found, key=lambda entry: entry[0])]
+
+    def complete(self, prompt: str) -> List[str]:
+        ''' The hint prompts that continue prompt, whose last token may be
+        partial, in sorted order.'''
+        args = prompt.split()
+        partial = '' if not args or prompt[-1].isspace() else args.pop()
+        node = self.root
+        for token in args:
+            node = node.get(token)
+            if node is None:
+                return []
+
+        completions = []
+        stack = [(args + [token], child) for token, child in node.items()
+                 if token is not None and token.startswith(partial)]
+        while stack:
+            tokens, node = stack.pop()
+            if None in node:
+                completions.append(' '.join(tokens))
+            stack += [(tokens + [token], child) for token, child in node.items() if token is not None]
+        return sorted(completions)
+
+
 class ShowMessage(Service):
     def __init__(self, message):
         super().__init__('show message')
@@ -158,3 +283,6 @@ class ShowMessage(Service):
             parsed_messages.extend(lines)
 
         return [MenuItem('show message', line) for line in parsed_messages]
+
+    def dependencies(self):
+        return []  # the message never changes
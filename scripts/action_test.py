@@ -0,0 +1,64 @@
+''' Memoized suggested actions, invalidated by the fingerprints of the
+dependencies of a service. '''
+
+import os
+
+import choose_lectures
+from action import MenuItem, Service
+from choose_lectures import ChooseLecture
+
+
+class Listing(Service):
+    'A service whose items are the files of a directory.'
+
+    def __init__(self, path):
+        super().__init__('listing')
+        self.path = path
+
+    def suggested_actions(self):
+        return [MenuItem(name) for name in sorted(os.listdir(str(self.path)))]
+
+    def dependencies(self):
+        return [self.path, self.path / 'a.tex']
+
+
+def names(service):
+    return [item.name for item in service.get_displayed_menuitems()]
+
+
+def test_actions_are_rebuilt_when_a_dependency_changes(tmp_path):
+    (tmp_path / 'a.tex').write_text('a')
+    service = Listing(tmp_path)
+    assert names(service) == ['a.tex']
+    assert service.cache_stats == {'hits': 0, 'misses': 1}
+    assert names(service) == ['a.tex']
+    assert service.cache_stats == {'hits': 1, 'misses': 1}
+
+    # a new mtime of a file
+    st = (tmp_path / 'a.tex').stat()
+    os.utime(str(tmp_path / 'a.tex'), ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    names(service)
+    assert service.cache_stats == {'hits': 1, 'misses': 2}
+
+    # a new file in a directory
+    (tmp_path / 'b.tex').write_text('b')
+    assert names(service) == ['a.tex', 'b.tex']
+    assert service.cache_stats == {'hits': 1, 'misses': 3}
+
+
+def test_new_documents_change_the_key_of_choose_lecture(tmp_path, monkeypatch):
+    course = tmp_path / 'course'
+    course.mkdir()
+    (course / 'lecture_01.tex').write_text('')
+    (course / 'lab_01.tex').write_text('')
+    link = tmp_path / 'current_course'
+    link.symlink_to(course)
+    monkeypatch.setattr(choose_lectures, 'CURRENT_COURSE_SYMLINK', link)
+
+    service = ChooseLecture('lecture')
+    assert service.document_files(course) == [course / 'lecture_01.tex']
+    key = service.dependency_key()
+    assert service.dependency_key() == key
+    (course / 'lecture_02.tex').write_text('')
+    assert service.dependency_key() != key
+    assert service.document_files(course) == [course / 'lecture_01.tex', course / 'lecture_02.tex']
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+
+class CourseBuild(NamedTuple):
+    'The outcome of building the master.tex of one course.'
+    course: str
+    returncode: int
+    cached: bool
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and self.error is None
+
+
+def build_course(course, range_string: str = 'all', force: bool = False) -> CourseBuild:
+    'Include range_string in the master.tex of course and compile it. Never raises.'
+    start = perf_counter()
+    try:
+        lectures = course.lectures
+        lectures.update_master_from_range_string(range_string)
+        result = lectures.compile_master(force=force)
+        return CourseBuild(course.name, result.returncode, result.cached, perf_counter() - start)
+    except Exception as e:
+        return CourseBuild(course.name, -1, False, perf_counter() - start, repr(e))
+
+
+def build_courses(courses: Iterable, jobs: int = None, range_string: str = 'all', force: bool = False,
+                  on_done: Callable[[CourseBuild], None] = None) -> List[CourseBuild]:
+    ''' Build the courses on a pool of jobs workers, one latexmk per worker.
+    jobs defaults to the number of cores. A failing course does not stop the
+    others. on_done is called with every result as soon as it is ready.
+    Return the results in the order of courses.'''
+    courses = list(courses)
+    jobs = jobs or os.cpu_count() or 1
+    results = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_course, course, range_string, force): i
+                   for i, course in enumerate(courses)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_done:
+                on_done(result)
+    return [results[i] for i in range(len(courses))]
+
+
+def format_build(result: CourseBuild) -> str:
+    status = 'cached' if result.cached else (
+        'ok' if result.ok else 'FAILED ({})'.format(result.error or 'exit code {}'.format(result.returncode)))
+    return '{:<40} {:>8.2f}s  exit {:>3}  {}'.format(result.course, result.seconds, result.returncode, status)
+
+
+def format_summary(results: List[CourseBuild], wall_seconds: float, jobs: int) -> str:
+    failed = [r for r in results if not r.ok]
+    busy = sum(r.seconds for r in results)
+    return '\n'.join([
+        '{} courses in {:.2f}s with {} jobs ({:.2f} courses/min, {:.2f}s of build time, {:.1f}x parallel)'.format(
+            len(results), wall_seconds, jobs,
+            len(results) / wall_seconds * 60 if wall_seconds else 0,
+            busy, busy / wall_seconds if wall_seconds else 0),
+        '{} cached, {} failed{}'.format(
+            sum(r.cached for r in results), len(failed),
+            ': ' + ', '.join(r.course for r in failed) if failed else ''),
+    ])
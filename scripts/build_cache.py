@@ -0,0 +1,120 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from config import BUILD_CACHE_NAME
+from master_file import MasterFile
+from stat_cache import StatCache
+
+# references to other input files in the LaTeX source
+INPUT_RE = re.compile(r'\\(?:input|include|subfile)\{([^}]+)\}')
+BIB_RE = re.compile(r'\\(?:addbibresource|bibliography)(?:\[[^\]]*\])?\{([^}]+)\}')
+INCFIG_RE = re.compile(r'\\incfig(?:\[[^\]]*\])?\{([^}]+)\}')
+GRAPHICS_RE = re.compile(r'\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}')
+GRAPHICS_EXTENSIONS = ['', '.pdf', '.png', '.jpg', '.jpeg', '.eps']
+
+
+class CompileResult(NamedTuple):
+    returncode: int
+    cached: bool  # the build was skipped, master.pdf is up to date
+
+
+class BuildCache():
+    ''' The content hash of everything master.tex is built from: master.tex,
+    the included documents, the preamble, the bibliography and the figures.
+
+    The hash of the inputs of the last successful build is stored with the
+    stat of master.pdf, so it is only trusted while that master.pdf exists
+    and is unchanged. The hash of every input file is cached by its stat, so
+    only changed files are read again.'''
+
+    PDF = 'master.pdf'
+
+    def __init__(self, course_path: Path, master: MasterFile):
+        self.path = course_path
+        self.master = master
+        self.cache = StatCache(course_path / BUILD_CACHE_NAME)
+
+    def name(self, path: Path) -> str:
+        try:
+            return str(path.relative_to(self.path))
+        except ValueError:
+            return str(path)
+
+    def file_info(self, path: Path) -> Optional[list]:
+        'Return [digest, referenced files] of an input file, or None if it does not exist.'
+        name = self.name(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        info = self.cache.get(name, st)
+        if info is None:
+            data = path.read_bytes()
+            info = [hashlib.blake2b(data, digest_size=16).hexdigest(),
+                    self.references(data.decode('utf-8', errors='replace')) if path.suffix == '.tex' else []]
+            self.cache.put(name, st, info)
+        return info
+
+    def references(self, source: str) -> List[str]:
+        'The files referenced by a LaTeX source, relative to the course directory.'
+        source = re.sub(r'(?<!\\)%.*', '', source)  # drop comments
+        refs = []
+        for name in INPUT_RE.findall(source):
+            refs.append(name if name.endswith('.tex') else name + '.tex')
+        for names in BIB_RE.findall(source):
+            refs.extend(n.strip() if n.strip().endswith('.bib') else n.strip() + '.bib'
+                        for n in names.split(','))
+        for name in INCFIG_RE.findall(source):
+            refs += ['figures/{}.pdf_tex'.format(name), 'figures/{}.pdf'.format(name)]
+        for name in GRAPHICS_RE.findall(source):
+            refs += ['?' + name]  # resolved against GRAPHICS_EXTENSIONS
+        return refs
+
+    def resolve(self, ref: str) -> Path:
+        if not ref.startswith('?'):
+            return self.path / ref
+        for extension in GRAPHICS_EXTENSIONS:
+            path = self.path / (ref[1:] + extension)
+            if path.is_file():
+                return path
+        return self.path / ref[1:]
+
+    def inputs_digest(self) -> str:
+        'The hash of master.tex and every file it depends on.'
+        _, indices, _ = self.master.read()
+        pending = [self.master.path] + [self.path / i.to_filename() for i in indices]
+        seen = set()
+        digest = hashlib.blake2b(digest_size=16)
+        while pending:
+            path = pending.pop(0)
+            if path in seen:
+                continue
+            seen.add(path)
+            info = self.file_info(path)
+            digest.update(self.name(path).encode())
+            digest.update(b'missing' if info is None else info[0].encode())
+            if info is not None:
+                pending += [self.resolve(ref) for ref in info[1]]
+        self.cache.save()
+        return digest.hexdigest()
+
+    def is_fresh(self, digest: str) -> bool:
+        'Was master.pdf built from inputs with this digest?'
+        try:
+            st = (self.path / self.PDF).stat()
+        except FileNotFoundError:
+            return False
+        return self.cache.get(self.PDF, st) == digest
+
+    def record(self, digest: str):
+        'Remember that master.pdf was built from inputs with this digest.'
+        try:
+            self.cache.put(self.PDF, (self.path / self.PDF).stat(), digest)
+            self.cache.save()
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self):
+        self.cache.invalidate()
@@ -0,0 +1,76 @@
+''' The build cache of a small course: master.pdf is fresh while every
+input is unchanged.
+'''
+
+import time
+from pathlib import Path
+
+from build_cache import BuildCache
+from lectures import MultiIndexSystem
+from master_file import MasterFile
+
+MASTER = '''\\documentclass{article}
+\\input{preamble.tex}
+\\begin{document}
+    % start lectures
+    \\input{lecture_01.tex}
+    % end lectures
+\\end{document}
+'''
+
+
+def course(tmp_path: Path) -> BuildCache:
+    (tmp_path / 'master.tex').write_text(MASTER)
+    (tmp_path / 'preamble.tex').write_text('\\usepackage{amsmath}\n')
+    (tmp_path / 'lecture_01.tex').write_text(
+        '\\lecture{1}{Mon 01 Jan 2024 10:00}{Groups}\n\\incfig{cube}\n% \\input{commented.tex}\n')
+    (tmp_path / 'figures').mkdir()
+    (tmp_path / 'figures' / 'cube.pdf').write_bytes(b'%PDF cube')
+    master = MasterFile(tmp_path / 'master.tex', MultiIndexSystem())
+    return BuildCache(tmp_path, master)
+
+
+def build(cache: BuildCache) -> str:
+    digest = cache.inputs_digest()
+    (cache.path / 'master.pdf').write_bytes(b'%PDF master')
+    cache.record(digest)
+    return digest
+
+
+def edit(path: Path, text: str):
+    time.sleep(0.01)  # a distinct mtime on filesystems with a coarse clock
+    path.write_text(text)
+
+
+def test_unchanged_inputs_are_fresh(tmp_path):
+    cache = course(tmp_path)
+    assert not cache.is_fresh(cache.inputs_digest())
+    digest = build(cache)
+    assert cache.references((tmp_path / 'lecture_01.tex').read_text()) == [
+        'figures/cube.pdf_tex', 'figures/cube.pdf']
+
+    # a new BuildCache, as in the next run, reads the digests from disk
+    again = BuildCache(tmp_path, cache.master)
+    assert again.inputs_digest() == digest
+    assert again.is_fresh(digest)
+    assert again.cache.misses == 0  # no input was read again
+
+
+def test_an_edit_is_a_miss(tmp_path):
+    cache = course(tmp_path)
+    digest = build(cache)
+    for path, text in [('lecture_01.tex', '\\lecture{1}{Mon 01 Jan 2024 10:00}{Rings}\n'),
+                       ('preamble.tex', '\\usepackage{amssymb}\n')]:
+        edit(tmp_path / path, text)
+        changed = cache.inputs_digest()
+        assert changed != digest and not cache.is_fresh(changed)
+        digest = build(cache)
+
+    # a figure that is only referenced, and master.pdf itself
+    edit(tmp_path / 'lecture_01.tex', '\\incfig{cube}\n')
+    digest = build(cache)
+    edit(tmp_path / 'figures' / 'cube.pdf', '%PDF another cube')
+    assert cache.inputs_digest() != digest
+    digest = build(cache)
+    edit(tmp_path / 'master.pdf', '%PDF from elsewhere')
+    assert not cache.is_fresh(digest)
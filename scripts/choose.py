@@ -1,6 +1,12 @@
 #!/usr/local/bin/python3
+from collections.abc import Sized
 from enum import Enum
+import os
 import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import MENU_HISTORY, MENU_TOP_K
+from fuzzy import FuzzyIndex, MenuHistory
 
 class Choose():
     class CODE(Enum):
@@ -9,9 +15,64 @@ class Choose():
 
     MAX_ROWS = 10
         
+    # appended to repeated options, so that every line is unique
+    ZERO_WIDTH_SPACE = '\u200b'
+    # send the TOP_K options chosen most recently first, None keeps the order
+    TOP_K = MENU_TOP_K
+    HISTORY = MENU_HISTORY
+    # when set, a callable (prompt, lines) -> (returncode, selected line)
+    # that replaces the choose process, e.g. a Headless chooser
+    backend = None
+    # the index of the last options ranked, reused while they are the same
+    _fuzzy_index = None
+
+    @classmethod
+    def run(cls, prompt, options, rofi_args=[], fuzzy=True, top_k=None):
+        ''' Show options, a list or any iterable of strings, and return
+        (returncode, index of the selected option or -1, selected text).
+
+        The chooser starts right away and the options are written to it as
+        they are produced, so an iterable that is slow to produce its last
+        options does not delay the first ones. Repeated options get an
+        invisible suffix, so that the selection maps back to the right one.
+
+        With top_k, the top_k options chosen most recently are sent first
+        and the others after them, see `pre_rank`. With
+        $CHOOSE_QUERY set, the best match of the query is chosen without
+        showing anything.'''
+        count = len(options) if isinstance(options, Sized) else None
+        positions: Dict[str, int] = {}
+        lines = cls.unique_lines(options, positions)
+        history = MenuHistory(cls.HISTORY)
+        top_k = cls.TOP_K if top_k is None else top_k
+
+        backend = cls.backend
+        if backend is None and 'CHOOSE_QUERY' in os.environ:
+            backend = Headless(os.environ['CHOOSE_QUERY'], history.recency())
+        if backend is not None:
+            returncode, selected = backend(prompt, list(lines))
+        else:
+            if top_k:
+                lines = cls.pre_rank(lines, top_k, history.recency())
+            returncode, selected = cls.choose(prompt, lines, count)
+
+        selected = selected.strip()
+        index = positions.get(selected, -1)
+        selected = selected.rstrip(cls.ZERO_WIDTH_SPACE)
+
+        if returncode == Choose.CODE.SELECTED.value:
+            returncode = Choose.CODE.SELECTED
+            if index != -1:
+                history.record(selected)
+        elif returncode == Choose.CODE.CANCEL.value:
+            returncode = Choose.CODE.CANCEL
+
+        return returncode, index, selected
+
     @classmethod
-    def run(cls, prompt, options, rofi_args=[], fuzzy=True):
-        optionstr = '\n'.join(option.replace('\n', ' ') for option in options)
+    def choose(cls, prompt, lines: Iterable[str], count: int = None) -> Tuple[int, str]:
+        ''' Show lines, count of them if it is known, with choose. Return its
+        exit code and the selected line.'''
         # args = ['rofi', '-sort', '-no-levenshtein-sort']
         # if fuzzy:
         #     args += ['-matching', 'fuzzy']
@@ -33,28 +94,97 @@ class Choose():
         # args += rofi_args
         # args = [str(arg) for arg in args]
 
-        nrows = min(cls.MAX_ROWS, len(options))
+        # the number of options is only known in advance for a list
+        nrows = min(cls.MAX_ROWS, count) if count is not None else cls.MAX_ROWS
         args += ['-n', str(nrows)]
         # print(nrows)
 
 
         args += prompt
 
-        result = subprocess.run(args, input=optionstr, stdout=subprocess.PIPE, universal_newlines=True)
-        returncode = result.returncode
-        selected = result.stdout.strip()
+        process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   universal_newlines=True)
+        cls.write_options(process.stdin, lines)
+        selected = process.stdout.read()
+        return process.wait(), selected
+
+    @classmethod
+    def unique_lines(cls, options: Iterable[str], positions: Dict[str, int]) -> Iterator[str]:
+        ''' The lines of the options, as they come. Record the position of
+        every line in positions, under the line stripped as the chooser
+        returns it. The suffix of a repeated option goes before any trailing
+        whitespace, so that it survives the strip.'''
+        for position, option in enumerate(options):
+            line = option.replace('\n', ' ')
+            key = line.strip()
+            suffix = ''
+            while key in positions:  # a repeated option
+                key += cls.ZERO_WIDTH_SPACE
+                suffix += cls.ZERO_WIDTH_SPACE
+            if suffix:
+                end = len(line.rstrip())
+                line = line[:end] + suffix + line[end:]
+            positions[key] = position
+            yield line
 
+    @staticmethod
+    def write_options(stdin, lines: Iterable[str]):
+        'Write the lines to the chooser as they come.'
         try:
-            index = [opt.strip() for opt in options].index(selected)
-        except ValueError:
-            index = -1
+            for line in lines:
+                stdin.write(line + '\n')
+                stdin.flush()
+            stdin.close()
+        except BrokenPipeError:
+            pass  # the chooser was closed before all options were written
 
-        if returncode == Choose.CODE.SELECTED.value:
-            returncode = Choose.CODE.SELECTED
-        elif returncode == Choose.CODE.CANCEL.value:
-            returncode = Choose.CODE.CANCEL
+    @classmethod
+    def fuzzy_index(cls, lines: List[str]) -> FuzzyIndex:
+        'The FuzzyIndex of lines, built again only when the menu changed.'
+        options = [line.replace(cls.ZERO_WIDTH_SPACE, '') for line in lines]
+        if cls._fuzzy_index is None or cls._fuzzy_index.options != options:
+            cls._fuzzy_index = FuzzyIndex(options)
+        return cls._fuzzy_index
 
-        return returncode, index, selected
+    @classmethod
+    def pre_rank(cls, lines: Iterable[str], top_k: int, recency: Dict[str, float]) -> Iterator[str]:
+        ''' The lines of the top_k options chosen most recently, the most
+        recent first, then every other line in order, so that every option
+        can still be chosen. The other lines are held back only until all
+        of those options came, or the lines ended, and stream after that.'''
+        recent = sorted(recency, key=lambda option: -recency[option])[:top_k]
+        wanted = set(recent)
+        found: Dict[str, str] = {}
+        held = []
+        lines = iter(lines)
+        while len(found) < len(recent):
+            line = next(lines, None)
+            if line is None:
+                break
+            option = line.strip()
+            if option in wanted and option not in found:
+                found[option] = line
+            else:
+                held.append(line)
+        yield from (found[option] for option in recent if option in found)
+        yield from held
+        yield from lines
+
+
+class Headless():
+    ''' A chooser that shows nothing, for scripts and tests. It selects the
+    best fuzzy match of query, or the query itself, as a typed prompt, if
+    nothing matches. A query of None cancels.'''
+
+    def __init__(self, query: Optional[str], recency: Dict[str, float] = None):
+        self.query = query
+        self.recency = recency
+
+    def __call__(self, prompt, lines: List[str]) -> Tuple[int, str]:
+        if self.query is None:
+            return Choose.CODE.CANCEL.value, ''
+        matches = Choose.fuzzy_index(lines).rank(self.query, self.recency, limit=1)
+        return Choose.CODE.SELECTED.value, lines[matches[0].position] if matches else self.query
 
 if __name__ == '__main__':
     print(Choose.run('test', ['a', 'b', 'c','a']))
\ No newline at end of file
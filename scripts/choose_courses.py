@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 from action import Action, MenuItem, Service
+from config import CURRENT_COURSE_SYMLINK, CURRENT_SEMESTER_SYMLINK, ROOT
 from courses import Course, Semester, courses, semesters
 from utils import MAX_LEN
 
@@ -38,6 +39,9 @@ class ChooseCurrentCourse(Service):
                     for course in courses if course is not courses.current]
         return actions
 
+    def dependencies(self):
+        return [CURRENT_COURSE_SYMLINK, courses.path]
+
 
 class DisplayCurrentCourse(MenuItem):
     'This is the current course.'
@@ -116,6 +120,10 @@ class ChooseCurrentSemester(Service):
                     for semester in semesters if semester is not semesters.current]
         return actions
 
+    def dependencies(self):
+        # the semesters are the directories <year>/<term> below ROOT
+        return [CURRENT_SEMESTER_SYMLINK, ROOT] + sorted(set(semester.path.parent for semester in semesters))
+
 
 if __name__ == '__main__':
     ChooseCurrentSemester().execute()
@@ -1,12 +1,23 @@
 #!/usr/local/bin/python3
+import os
+from pathlib import Path
+from typing import List
+
 from action import Action, Service
+from config import CURRENT_COURSE_SYMLINK
 from courses import courses
-from lectures import Lecture, Lectures
+from lectures import Lecture, Lectures, MultiIndexSystem
+from range_query import RangeError
 from courses import Course
 from utils import generate_short_title, MAX_LEN
 
-current_course = courses.current
-lectures = current_course.lectures
+
+def current_course() -> Course:
+    return courses.current
+
+
+def current_lectures() -> Lectures:
+    return courses.current.lectures
 
 
 class OpenLecture(Action):
@@ -46,11 +57,11 @@ class CreateLecture(Action):
 
     def execute(self, ):
         self.logger.info(
-            'Creating new lecture in {}'.format(current_course.name))
+            'Creating new lecture in {}'.format(current_course().name))
         try:
-            new_lecture = lectures.new_doc(
+            new_lecture = current_lectures().new_doc(
                 name=self.lecture_name, type_name=self.type_name)
-            OpenLecture(new_lecture, current_course).execute()
+            OpenLecture(new_lecture, current_course()).execute()
         except:
             self.logger.exception(
                 'Could not create lecture: {}'.format(self.lecture_name))
@@ -71,6 +82,8 @@ class CreateLectureService(Service):
 class ChooseLecture(Service):
     '''Choose a document from the current course. The document will be opened in vimtex. The index (eg. `Lecture 1`) is given as an argument. If no argument is given, nothing will happen.'''
 
+    index_system = MultiIndexSystem()
+
     def __init__(self, type_name='lecture',):
         super().__init__(
             name='choose documents')
@@ -78,15 +91,35 @@ class ChooseLecture(Service):
         self.hint_word = ['Open'] + [type_name.capitalize()]
 
     def suggested_actions(self):
-        return [OpenLecture(lecture, current_course) for lecture in lectures if lecture.index[0] == self.type_name]
+        # only called once the files changed, which the documents in memory may not know yet
+        lectures = current_lectures()
+        lectures.reload()
+        return [OpenLecture(lecture, current_course()) for lecture in lectures if lecture.index[0] == self.type_name]
+
+    def dependencies(self):
+        course = CURRENT_COURSE_SYMLINK.resolve()
+        return [CURRENT_COURSE_SYMLINK, course, course / 'info.yaml'] + self.document_files(course)
+
+    def document_files(self, course: Path) -> List[Path]:
+        'The files of the documents of this type, as they are on disk.'
+        with os.scandir(course) as entries:
+            return sorted(Path(entry.path) for entry in entries
+                          if self.index_system.is_filename_valid(entry.name) and
+                          self.index_system.DocIndex.from_filename(entry.name)[0] == self.type_name)
 
     def make_custom_action(self, args):
         if args:
-            lecture_number = lectures.parse_range_string(
-                self.type_name + ' ' + ' '.join(args))[0]
+            lectures = current_lectures()
+            try:
+                lecture_number = lectures.parse_range_string(
+                    self.type_name + ' ' + ' '.join(args))[0]
+            except (RangeError, IndexError):
+                self.logger.warning(
+                    'Not a document: {}'.format(' '.join(args)))
+                return None
             if lecture_number in lectures.all_indices:
                 try:
-                    return OpenLecture(lectures.get_from_index(lecture_number), current_course)
+                    return OpenLecture(lectures.get_from_index(lecture_number), current_course())
                 except IndexError:
                     pass
 
@@ -102,7 +135,7 @@ class CreateDocumentTypeService(Service):
         # check that the document type does not already exist
         if args:
             type_name = args[0]
-            if type_name in lectures.all_types:
+            if type_name in current_lectures().all_types:
                 self.logger.error(
                     'Document type {} already exists'.format(type_name))
                 return None
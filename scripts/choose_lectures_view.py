@@ -2,7 +2,10 @@
 from action import Action, Service
 from courses import courses
 
-lectures = courses.current.lectures
+
+def current_lectures():
+    return courses.current.lectures
+
 
 commands = [('last lecture', 'Current lecture'),
             ('prev-last', 'Last two documents'),
@@ -23,9 +26,12 @@ class SetCompileRange(Action):
         )
 
     def execute(self, ):
+        lectures = current_lectures()
         lectures.update_master_from_range_string(self.range)
         self.logger.info(self.display_name)
-        lectures.compile_master()
+        # the build cache skips the compile when nothing changed
+        if lectures.compile_master().cached:
+            self.logger.info('master.pdf is up to date')
 
 
 class ChooseCompileRange(Service):
@@ -42,10 +48,13 @@ class ChooseCompileRange(Service):
     def suggested_actions(self):
         return [SetCompileRange(cmd, disp) for cmd, disp in commands]
 
+    def dependencies(self):
+        return []  # the commands never change
+
     def make_custom_action(self, args):
         range_str = ' '.join(args)
         try:
-            lectures.parse_range_string(range_str)
+            current_lectures().parse_range_string(range_str)
             return SetCompileRange(range_str, 'User entered range: ' + range_str)
         except:
             self.logger.exception(
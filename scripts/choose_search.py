@@ -0,0 +1,71 @@
+#!/usr/local/bin/python3
+from action import Action, Service
+from lectures import Lecture, MultiIndexSystem
+from search_index import SearchHit, SearchIndex
+from utils import MAX_LEN
+
+
+class OpenSearchHit(Action):
+    'Open the document at the line that matched the search.'
+
+    def __init__(self, hit: SearchHit):
+        self.hit = hit
+        super().__init__(
+            name='Open search hit {}:{}'.format(hit.file_path, hit.line),
+            display_name='{course:<{fill}} {index:<14} {text}'.format(
+                fill=MAX_LEN,
+                course=hit.course.name,
+                index='{} {}:{}'.format(hit.index[0], hit.index[1], hit.line),
+                text=hit.text[:80]),
+        )
+
+    def execute(self, ):
+        self.logger.info('Opening {} at line {}'.format(self.hit.file_path, self.hit.line))
+        Lecture(self.hit.file_path, MultiIndexSystem()).edit(self.hit.line)
+
+
+class SearchResults(Service):
+    'The documents of all semesters that match a search, best first.'
+
+    def __init__(self, query: str):
+        super().__init__(name='search results')
+        self.query = query
+
+    def suggested_actions(self):
+        index = SearchIndex()
+        try:
+            index.refresh()
+            return [OpenSearchHit(hit) for hit in index.search(self.query)]
+        finally:
+            index.close()
+
+
+class SearchLectures(Action):
+    'Search the text of all documents, and choose one of the matches.'
+
+    def __init__(self, query: str):
+        self.query = query
+        super().__init__(
+            name='search {}'.format(query),
+            display_name='Search {}'.format(query),
+        )
+
+    def execute(self, ):
+        self.logger.info('Searching for {}'.format(self.query))
+        SearchResults(self.query).execute()
+
+
+class SearchService(Service):
+    '''Search the text of the documents of all semesters. The search terms are given as arguments, e.g. `Search sylow theorem`. LaTeX commands are ignored, except for greek letters in math.'''
+
+    def __init__(self):
+        super().__init__(name='search documents')
+        self.hint_word = ['Search']
+
+    def make_custom_action(self, args):
+        if args:
+            return SearchLectures(' '.join(args))
+
+
+if __name__ == '__main__':
+    SearchService().execute()
@@ -0,0 +1,169 @@
+''' Choose.run with a stub `choose` on the PATH, which records the lines
+it was given and prints the line number $CHOOSE_LINE.
+'''
+
+import os
+import time
+from pathlib import Path
+
+from action import Action, Service
+from choose import Choose, Headless
+from chooses import AllChoicesService
+
+STUB_CHOOSE = '''#!/bin/sh
+tee "$CHOOSE_LOG" | sed -n "${CHOOSE_LINE:-1}p"
+'''
+
+
+def stub_choose(tmp_path: Path, monkeypatch, line: int) -> Path:
+    (tmp_path / 'choose').write_text(STUB_CHOOSE)
+    (tmp_path / 'choose').chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ['PATH'])
+    monkeypatch.setenv('CHOOSE_LINE', str(line))
+    monkeypatch.setenv('CHOOSE_LOG', str(tmp_path / 'log'))
+    monkeypatch.setattr(Choose, 'HISTORY', tmp_path / 'history.json')
+    return tmp_path / 'log'
+
+
+def test_repeated_options_map_to_their_position(tmp_path, monkeypatch):
+    stub_choose(tmp_path, monkeypatch, 4)
+    assert Choose.run('test', ['a', 'b', 'c', 'a']) == (Choose.CODE.SELECTED, 3, 'a')
+    monkeypatch.setenv('CHOOSE_LINE', '1')
+    assert Choose.run('test', ['a', 'b', 'c', 'a']) == (Choose.CODE.SELECTED, 0, 'a')
+
+
+def test_repeated_options_with_trailing_whitespace(tmp_path, monkeypatch):
+    log = stub_choose(tmp_path, monkeypatch, 2)
+    assert Choose.run('test', ['a ', 'a ', '  a']) == (Choose.CODE.SELECTED, 1, 'a')
+    monkeypatch.setenv('CHOOSE_LINE', '3')
+    assert Choose.run('test', ['a ', 'a ', '  a']) == (Choose.CODE.SELECTED, 2, 'a')
+    # the indentation of the lines is kept
+    assert log.read_text().splitlines()[2].startswith('  a')
+
+
+def test_options_are_streamed(tmp_path, monkeypatch):
+    log = stub_choose(tmp_path, monkeypatch, 2)
+
+    def options():
+        yield 'first'
+        # the chooser already has the first option
+        deadline = time.monotonic() + 5
+        while not log.exists() or 'first' not in log.read_text():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        yield 'second\nline'
+
+    assert Choose.run('test', options()) == (Choose.CODE.SELECTED, 1, 'second line')
+
+
+def test_typed_prompt_has_no_index(tmp_path, monkeypatch):
+    stub_choose(tmp_path, monkeypatch, 3)  # there is no third line
+    assert Choose.run('test', ['a', 'b']) == (Choose.CODE.SELECTED, -1, '')
+
+
+def test_top_k_sends_the_recent_options_first(tmp_path, monkeypatch):
+    log = stub_choose(tmp_path, monkeypatch, 1)
+    options = ['option {}'.format(i) for i in range(50)]
+    for line in ['31', '41', '41']:
+        monkeypatch.setenv('CHOOSE_LINE', line)
+        Choose.run('test', options)
+    monkeypatch.setenv('CHOOSE_LINE', '1')
+    assert Choose.run('test', options, top_k=2) == (Choose.CODE.SELECTED, 40, 'option 40')
+    sent = log.read_text().splitlines()
+    assert sent[:3] == ['option 40', 'option 30', 'option 0']
+    # every other option can still be chosen
+    assert sorted(sent) == sorted(options)
+    monkeypatch.setenv('CHOOSE_LINE', '50')
+    assert Choose.run('test', options, top_k=2)[1:] == (49, 'option 49')
+
+
+def test_top_k_streams_once_the_recent_options_came():
+    consumed = []
+
+    def options():
+        for i in range(10):
+            consumed.append(i)
+            yield 'option {}'.format(i)
+
+    recency = {'option 5': 0.5, 'option 2': 0.9, 'elsewhere': 0.1}
+    lines = Choose.pre_rank(options(), 2, recency)
+    assert [next(lines), next(lines), next(lines)] == ['option 2', 'option 5', 'option 0']
+    assert consumed == list(range(6))
+    assert list(lines)[-1] == 'option 9'
+    # a recent option that is not in the menu holds back until the end
+    assert list(Choose.pre_rank(['a', 'b'], 2, {'b': 1, 'c': 0.5})) == ['b', 'a']
+    assert list(Choose.pre_rank(['a', 'b'], 2, {})) == ['a', 'b']
+
+
+def test_the_fuzzy_index_is_reused_for_the_same_menu():
+    index = Choose.fuzzy_index(['a', 'b'])
+    assert Choose.fuzzy_index(['a', 'b']) is index
+    assert Choose.fuzzy_index(['a', 'c']) is not index
+
+
+def test_headless(tmp_path, monkeypatch):
+    monkeypatch.setattr(Choose, 'HISTORY', tmp_path / 'history.json')
+    options = ['New Lecture', 'Lecture 1: Groups', 'Lecture 2: Rings', 'New Lecture']
+    monkeypatch.setattr(Choose, 'backend', Headless('lec 2'))
+    assert Choose.run('test', options) == (Choose.CODE.SELECTED, 2, 'Lecture 2: Rings')
+    monkeypatch.setattr(Choose, 'backend', Headless('New Lecture Foo'))
+    assert Choose.run('test', options) == (Choose.CODE.SELECTED, -1, 'New Lecture Foo')
+    monkeypatch.setattr(Choose, 'backend', Headless(None))
+    assert Choose.run('test', options)[0] is Choose.CODE.CANCEL
+
+    monkeypatch.setattr(Choose, 'backend', None)
+    monkeypatch.setenv('CHOOSE_QUERY', 'rings')
+    assert Choose.run('test', options)[1] == 2
+
+
+class Record(Action):
+    executed = []
+
+    def execute(self):
+        self.executed.append(self.name)
+
+
+class Fixed(Service):
+    def __init__(self, name, actions, delay=0):
+        super().__init__(name)
+        self.fixed_actions = actions
+        self.delay = delay
+
+    def suggested_actions(self):
+        time.sleep(self.delay)
+        return list(self.fixed_actions)
+
+
+def test_selection_maps_to_the_menuitem_of_a_streamed_menu(tmp_path, monkeypatch):
+    stub_choose(tmp_path, monkeypatch, 3)
+    Record.executed = []
+    menu = AllChoicesService([Fixed('one', [Record('first', 'Open')]),
+                              Fixed('two', [Record('second', 'Open')], delay=0.05),
+                              Record('third', 'Open')])
+    menu.execute()
+    assert Record.executed == ['third']
+
+
+class Create(Service):
+    def __init__(self, *hint_word):
+        super().__init__(' '.join(hint_word))
+        self.hint_word = list(hint_word)
+
+    def make_custom_action(self, args):
+        return Record('{} {}'.format(self.name, ' '.join(args)))
+
+
+def test_prompts_are_dispatched_by_hint_words():
+    menu = AllChoicesService([Fixed('one', []), Create('New', 'Lecture'), Create('New', 'Lab'),
+                              Create('New', 'Document', 'Type'), Create('Include')])
+    assert menu.action_from_prompt('New Lab Foo').name == 'New Lab Foo'
+    assert menu.action_from_prompt(' Include lecture 1-3').name == 'Include lecture 1-3'
+    assert menu.action_from_prompt('New Document Type exam').name == 'New Document Type exam'
+    assert menu.action_from_prompt('New Homework') is None
+    assert menu.action_from_prompt('') is None
+    assert [service.name for service in menu.prompt_trie.services(['New', 'Lab'])] == ['New Lab']
+
+    assert menu.complete('New L') == ['New Lab', 'New Lecture']
+    assert menu.complete('New ') == ['New Document Type', 'New Lab', 'New Lecture']
+    assert menu.complete('') == ['Include', 'New Document Type', 'New Lab', 'New Lecture']
+    assert menu.complete('Open') == []
@@ -1,5 +1,6 @@
 from action import Action, Service
 from courses import Course, courses
+from pdf_export import export_courses
 from utils import MAX_LEN
 
 
@@ -31,6 +32,9 @@ class ChooseCoursePDF(Service):
     def suggested_actions(self):
         return [OpenCoursePDF(course) for course in courses]
 
+    def dependencies(self):
+        return [courses.path]
+
 class ExportCurrentCoursePDF(Action):
     'Export the compiled PDF of this course.'
 
@@ -39,17 +43,33 @@ class ExportCurrentCoursePDF(Action):
             name='Export course PDF',
             display_name='Export course PDF',
         )
-    
 
     def execute(self, ):
         self.logger.info('Exporting course PDF')
-        pdf_path = str(courses.current.lectures.path / 'master.pdf')
-        # copy the file to desktop of current user
-        from shutil import copyfile
-        from pathlib import Path
-        home = str(Path.home())
-        copyfile(pdf_path, home + '/Desktop/' + courses.current.name + '.pdf')
+        log_export(self.logger, export_courses([courses.current]))
+
+
+class ExportAllCoursePDFs(Action):
+    'Export the compiled PDFs of all courses of the current semester. PDFs that did not change since the last export are skipped.'
+
+    def __init__(self):
+        super().__init__(
+            name='Export all course PDFs',
+            display_name='Export all course PDFs',
+        )
+
+    def execute(self, ):
+        self.logger.info('Exporting all course PDFs')
+        log_export(self.logger, export_courses(courses))
+
 
+def log_export(logger, results):
+    for result in results:
+        if result.ok:
+            logger.info('{}: {}'.format(result.target, result.status))
+        else:
+            logger.error('Could not export {}: {} {}'.format(
+                result.source, result.status, result.error))
 
 
 if __name__ == '__main__':
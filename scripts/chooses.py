@@ -1,80 +1,206 @@
 #!/usr/local/bin/python3
 
+import threading
+from concurrent.futures import Future, TimeoutError
 from pathlib import Path
-from typing import List, Union
-from action import Action, MenuItem, Service
-from courses import courses, semesters
-from show_picture import ShowPictureAction
+from time import monotonic
+from typing import Dict, Iterator, List, Union
+from action import Action, MenuItem, PromptTrie, Service
 
 # register all services and options
 
-exists_semester_current = semesters.has_current()
-exists_course_current = courses.has_current()
 
-services: List[Union[Service, MenuItem]] = []
+def build_services() -> List[Union[Service, MenuItem]]:
+    'Create the services and options of the menu, for the current semester and course.'
+    from courses import courses, semesters
+    from show_picture import ShowPictureAction
+
+    exists_semester_current = semesters.has_current()
+    exists_course_current = courses.has_current()
+
+    services: List[Union[Service, MenuItem]] = []
+
+    if exists_course_current:
+        from choose_lectures_view import ChooseCompileRange
+        from choose_courses import ChooseCurrentCourse, DisplayCurrentCourse
+        from choose_lectures import ChooseLecture, CreateLectureService, CreateDocumentTypeService
+        services += [ChooseCompileRange(),
+                     DisplayCurrentCourse(), ]
+
+        append = []
+        for type_name in courses.current.lectures.all_types:
+            services += [ChooseLecture(type_name), ]
+            append += [CreateLectureService(type_name)]
+        services += append
+        services += [CreateDocumentTypeService(), ]
+        services += [
+            ChooseCurrentCourse(),
+        ]
+
+    if exists_semester_current:
+        from choose_view_pdf import ChooseCoursePDF, ExportAllCoursePDFs, ExportCurrentCoursePDF
+        from choose_courses import CreateCourseService, ChooseCurrentSemester
+        services += [
+            CreateCourseService(),
+            ChooseCoursePDF(),
+            ExportCurrentCoursePDF(),
+            ExportAllCoursePDFs(),
+            ChooseCurrentSemester(), ]
+
+    from choose_search import SearchService
+    services += [SearchService(), ]
+
+    from choose_logseq import ConvertVimtexAction
+    services += [ConvertVimtexAction(),
+                 ShowPictureAction(Path(__file__).parent / 'assets/inkscape_shortcut.png'), ]
+    return services
+
+
+def services_layout() -> tuple:
+    ''' What `build_services` depends on: the current semester and course,
+    and the document types of the course. The services only need to be
+    created again when it changes.'''
+    from courses import courses, semesters
+    layout = (semesters.current.key if semesters.has_current() else None,)
+    if courses.has_current():
+        layout += (courses.current.key, tuple(courses.current.lectures.all_types))
+    return layout
+
+
+class DaemonThreadPool():
+    ''' Runs calls on daemon threads, at most max_workers at a time. Unlike
+    the workers of a ThreadPoolExecutor, they are not joined at exit, so a
+    service that hangs is abandoned instead of blocking the exit.'''
+
+    def __init__(self, max_workers: int):
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def submit(self, fn) -> Future:
+        future = Future()
+
+        def run():
+            with self._slots:
+                if not future.set_running_or_notify_cancel():
+                    return  # cancelled while waiting for a slot
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+        threading.Thread(target=run, daemon=True).start()
+        return future
 
-if exists_course_current:
-    from choose_lectures_view import ChooseCompileRange
-    from choose_courses import ChooseCurrentCourse, DisplayCurrentCourse
-    from choose_lectures import ChooseLecture, CreateLectureService, CreateDocumentTypeService
-    services += [ChooseCompileRange(),
-                 DisplayCurrentCourse(), ]
 
-    append = []
-    for type_name in courses.current.lectures.all_types:
-        services += [ChooseLecture(type_name), ]
-        append += [CreateLectureService(type_name)]
-    services += append
-    services += [CreateDocumentTypeService(), ]
-    services += [
-        ChooseCurrentCourse(),
-    ]
+class AllChoicesService(Service):
+    '''All services, to be invoked by global shortcut.
 
+    The menu items of the services are collected concurrently, each service
+    within the deadline. A service that misses it is shown as a placeholder
+    and keeps running in the background; its items are used the next time
+    the menu is shown by the same AllChoicesService, which is why the menu
+    daemon keeps one alive.'''
 
-if exists_semester_current:
-    from choose_view_pdf import ChooseCoursePDF, ExportCurrentCoursePDF
-    from choose_courses import CreateCourseService, ChooseCurrentSemester
-    services += [
-        CreateCourseService(),
-        ChooseCoursePDF(),
-        ExportCurrentCoursePDF(),
-        ChooseCurrentSemester(), ]
+    # seconds a service may take to list its menu items
+    DEADLINE = 0.5
+    MAX_WORKERS = 8
 
-from choose_logseq import ConvertVimtexAction
-services += [ConvertVimtexAction(), 
-             ShowPictureAction(Path(__file__).parent / 'assets/inkscape_shortcut.png'), ]
+    def __init__(self, services: List[Union[Service, MenuItem]] = None, deadline: float = DEADLINE):
+        super().__init__(name='ALL')
+        self.services = services if services is not None else build_services()
+        self.deadline = deadline
+        self.pending: Dict[int, Future] = {}  # position of the service -> unfinished future
+        self._pool = None
+        self._prompt_trie = None
+
+    @property
+    def pool(self) -> DaemonThreadPool:
+        if self._pool is None:
+            self._pool = DaemonThreadPool(min(self.MAX_WORKERS, len(self.services) or 1))
+        return self._pool
+
+    def close(self):
+        ''' Cancel the services that have not started yet, and abandon the
+        ones still running, whose threads do not keep the process alive.'''
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self._pool = None
 
+    def suggested_actions(self):
+        return list(self.iter_suggested_actions())
 
-class AllChoicesService(Service):
-    'All services, to be invoked by global shortcut'
+    def iter_displayed_menuitems(self) -> Iterator[MenuItem]:
+        yield from self.iter_suggested_actions()
+        yield from self.hint_menuitems()
 
-    def __init__(self):
-        super().__init__(name='ALL')
-        self.services = services
+    def iter_suggested_actions(self) -> Iterator[MenuItem]:
+        ''' The menu items of all services in registration order, each one as
+        soon as the services before it are done or have missed the deadline.'''
+        futures = {}
+        for position, service in enumerate(self.services):
+            if isinstance(service, Service):
+                # a service that missed the last deadline is not started again
+                futures[position] = self.pending.pop(position, None) or \
+                    self.pool.submit(service.get_displayed_menuitems)
+        deadline = monotonic() + self.deadline
 
-    def suggested_actions(self):
-        actions = []
-        for service in self.services:
-            try:
-                actions.extend(service.get_displayed_menuitems())
-            except AttributeError:  # is a MenuItem instead of a Service
+        for position, service in enumerate(self.services):
+            if position not in futures:  # is a MenuItem instead of a Service
                 assert isinstance(service, MenuItem)
-                actions.append(service)
-                pass
+                yield service
+                continue
+            future = futures[position]
+            try:
+                yield from future.result(timeout=max(0, deadline - monotonic()))
+            except TimeoutError:
+                self.logger.warning('Service {} missed its deadline of {}s'.format(
+                    service.name, self.deadline))
+                self.pending[position] = future
+                yield from self.placeholder(service)
             except NotImplementedError:
                 pass
-        return actions
+            except Exception:
+                self.logger.exception('Failed to list the menu items of {}'.format(service.name))
 
-    def action_from_prompt(self, prompt):
-        for service in services:
+    @property
+    def cache_stats(self) -> dict:
+        'The hits and misses of the memoized actions of all services.'
+        stats = {'hits': 0, 'misses': 0}
+        for service in self.services:
             if isinstance(service, Service):
-                try:
-                    action: Action = service.action_from_prompt(prompt)
-                    if action:
-                        return action
-                except NotImplementedError:
-                    pass
+                stats['hits'] += service.cache_hits
+                stats['misses'] += service.cache_misses
+        return stats
+
+    @staticmethod
+    def placeholder(service: Service) -> List[MenuItem]:
+        placeholder = MenuItem('loading {}'.format(service.name),
+                               '{} (loading...)'.format(service.name.capitalize()))
+        placeholder.description = 'The items of this service are still loading, and will be shown next time.'
+        return [placeholder] + service.hint_menuitems()
+
+    @property
+    def prompt_trie(self) -> PromptTrie:
+        if self._prompt_trie is None:
+            self._prompt_trie = PromptTrie(self.services)
+        return self._prompt_trie
+
+    def action_from_prompt(self, prompt):
+        # only the services whose hint words start the prompt
+        for service in self.prompt_trie.services(prompt.strip().split()):
+            try:
+                action: Action = service.action_from_prompt(prompt)
+                if action:
+                    return action
+            except NotImplementedError:
+                pass
+
+    def complete(self, prompt: str) -> List[str]:
+        'The hint prompts that continue a partially typed prompt.'
+        return self.prompt_trie.complete(prompt)
 
 
 if __name__ == '__main__':
-    AllChoicesService().execute()
+    from menu_daemon import run_client
+    # the menu daemon keeps the services warm. without it, build them here
+    if not run_client():
+        AllChoicesService().execute()
@@ -1,9 +1,23 @@
 #!/usr/local/bin/python3
+import argparse
+import os
+import sys
+from time import perf_counter
+
+from batch_build import build_courses, format_build, format_summary
 from courses import courses
 
-for course in courses:
-    lectures = course.lectures
+parser = argparse.ArgumentParser(
+    description='Include all documents in the master.tex of every course and compile them in parallel.')
+parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                    help='number of courses compiled at the same time (default: number of cores)')
+parser.add_argument('-f', '--force', action='store_true',
+                    help='compile even if master.pdf is up to date')
+args = parser.parse_args()
+
+start = perf_counter()
+results = build_courses(courses, jobs=args.jobs, force=args.force,
+                        on_done=lambda result: print(format_build(result), flush=True))
+print(format_summary(results, perf_counter() - start, args.jobs))
 
-    r = lectures.parse_range_string('all')
-    lectures.update_docs_in_master(r)
-    lectures.compile_master()
+sys.exit(0 if all(result.ok for result in results) else 1)
@@ -0,0 +1,36 @@
+#!/usr/local/bin/python3
+import argparse
+import sys
+
+from config import CURRENT_SEMESTER_SYMLINK, ROOT
+from cross_course import Digest, DocumentBuckets, parse_query
+from workspace_index import WorkspaceIndex
+
+parser = argparse.ArgumentParser(
+    description='Compile the documents of many courses that match a query into one digest, '
+                'e.g. "all lecture this week" or "last lab in every course".')
+parser.add_argument('query', nargs='+')
+parser.add_argument('-a', '--all-semesters', action='store_true',
+                    help='query the courses of all semesters, not only the current one')
+parser.add_argument('-n', '--dry-run', action='store_true',
+                    help='only list the matching documents')
+args = parser.parse_args()
+
+query_string = ' '.join(args.query)
+semester = CURRENT_SEMESTER_SYMLINK.resolve()
+index = WorkspaceIndex()
+buckets = DocumentBuckets.from_index(index, None if args.all_semesters else semester)
+index.close()
+documents = buckets.resolve(parse_query(query_string))
+
+for doc in documents:
+    print('{:<30} {:<10} {:>3}  week {:>2}  {}'.format(
+        doc.course_name, doc.index[0], doc.index[1], doc.week, doc.title))
+if args.dry_run:
+    sys.exit(0)
+if not documents:
+    sys.exit('No documents match {!r}'.format(query_string))
+
+digest = Digest((ROOT if args.all_semesters else semester) / 'digest', semester / 'preamble.tex')
+digest.write(documents, 'Digest: ' + query_string)
+sys.exit(digest.compile())
@@ -14,9 +14,46 @@ USERCALENDARID = 'primary'
 ROOT = Path('~/univ').expanduser()
 CURRENT_SEMESTER_SYMLINK = Path('~/univ/current_semester').expanduser()
 CURRENT_COURSE_SYMLINK = Path('~/univ/current_course').expanduser()
-CURRENT_COURSE_ROOT = CURRENT_COURSE_SYMLINK.resolve()
 CURRENT_COURSE_WATCH_FILE = Path('/tmp/current_course').resolve()
+# Unix socket of the menu daemon, see menu_daemon.py
+MENU_SOCKET = Path('/tmp/university-menu.sock')
+# when and how often every menu option was chosen, to rank recent ones first
+MENU_HISTORY = ROOT / '.menu-history.json'
+# send the MENU_TOP_K options chosen most recently first, None keeps the menu order
+MENU_TOP_K = None
 DATE_FORMAT = '%a %d %b %Y %H:%M'
+# SQLite index of all semesters, courses and documents, see workspace_index.py
+WORKSPACE_INDEX = ROOT / '.workspace-index.sqlite3'
+# full-text index of all documents, see search_index.py
+SEARCH_INDEX = ROOT / '.search-index.sqlite3'
+# parsed info.yaml of all courses, keyed by the stat of each file
+INFO_CACHE = ROOT / '.info-cache.json'
+# per-course cache of the parsed document deflines
+LECTURES_CACHE_NAME = '.lectures-cache.json'
+# per-course hashes of the inputs of the last successful build of master.tex
+BUILD_CACHE_NAME = '.build-cache.json'
+# per-course hashes of the Inkscape figures, stored in figures/
+FIGURES_CACHE_NAME = '.figures-cache.json'
+# the command that exports a figure, {svg}, {pdf} and {pdf_tex} are replaced by its paths
+FIGURE_EXPORT_COMMAND = ['inkscape', '{svg}', '--export-area-page', '--export-dpi=300',
+                         '--export-type=pdf', '--export-latex', '--export-filename={pdf}']
+# where the compiled PDFs of the courses are exported to
+EXPORT_DIR = Path('~/Desktop').expanduser()
+# hashes of the exported PDFs, so that unchanged ones are not copied again
+EXPORT_MANIFEST = ROOT / '.export-manifest.json'
+# hardlink exported PDFs instead of copying them, where the filesystem allows.
+# LaTeX rewrites master.pdf in place, which then also changes the export
+EXPORT_HARDLINKS = False
+# how master.tex selects the compiled documents: 'input' lists only the
+# documents in the range, 'includeonly' includes all documents and selects
+# the range with \includeonly, which keeps numbering and references stable
+MASTER_INCLUDE_MODE = 'input'
+
+def __getattr__(name):
+    # paths derived from the workspace are only resolved when they are used
+    if name == 'CURRENT_COURSE_ROOT':
+        return CURRENT_COURSE_SYMLINK.resolve()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 LOGSEQ_ROOT = Path(r'C:\Users\86186\Documents\logseq')
 LOGSEQ_PROJ_NAME = 'Feliconut'
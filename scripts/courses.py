@@ -1,26 +1,65 @@
 #!/usr/local/bin/python3
 
-import os
+import json
 from pathlib import Path
 from shutil import rmtree
 from time import sleep
+from typing import List
 
-import yaml
-
-from config import (CURRENT_COURSE_ROOT, CURRENT_COURSE_SYMLINK,
-                    CURRENT_COURSE_WATCH_FILE, CURRENT_SEMESTER_SYMLINK, ROOT)
+from config import (CURRENT_COURSE_SYMLINK, CURRENT_COURSE_WATCH_FILE,
+                    CURRENT_SEMESTER_SYMLINK, INFO_CACHE, ROOT)
 from lectures import Lectures
-from utils import recursive_iterdir
+from stat_cache import StatCache
+from utils import SymlinkTarget, file_key, scan_workspace
 from vimtex_popup import wait_vim_edit
 
 
+_info_cache = None
+
+# the targets of the current course and semester symlinks
+CURRENT_COURSE = SymlinkTarget(CURRENT_COURSE_SYMLINK)
+CURRENT_SEMESTER = SymlinkTarget(CURRENT_SEMESTER_SYMLINK)
+
+
+def load_info(path: Path) -> dict:
+    ''' Load an info.yaml. The parsed content is cached across processes in
+    INFO_CACHE, and only parsed again when the mtime or size of the file changes.'''
+    global _info_cache
+    if _info_cache is None:
+        _info_cache = StatCache(INFO_CACHE)
+
+    st = path.stat()
+    info = _info_cache.get(str(path), st)
+    if info is None:
+        import yaml
+        # the libyaml loader is much faster, if it is available
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with path.open() as f:
+            info = yaml.load(f, Loader=loader)
+        try:
+            json.dumps(info)  # e.g. dates cannot be cached
+            _info_cache.put(str(path), st, info)
+            _info_cache.save_at_exit()
+        except TypeError:
+            pass
+    return info
+
+
 class Course():
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, info: dict = None):
+        'info is the content of info.yaml, if it is already known. Otherwise it is loaded on first access.'
         self.path = path
         self.name = path.stem
 
-        self.info = yaml.safe_load((path / 'info.yaml').open())
+        self._info = info  # lazy loading
         self._lectures = []  # lazy loading
+        self._key = None
+
+    @property
+    def info(self) -> dict:
+        if self._info is None:
+            self._info = load_info(self.path / 'info.yaml')
+        return self._info
 
     @property
     def lectures(self):
@@ -37,10 +76,17 @@ class Course():
             return False
         return self.path == other.path
 
+    @property
+    def key(self):
+        'The (st_dev, st_ino) identity of the course directory.'
+        if self._key is None:
+            self._key = file_key(self.path)
+        return self._key
+
     @property
     def is_activated(self):
         'Is the course the current course?'
-        return os.path.samefile(self.path, CURRENT_COURSE_SYMLINK)
+        return CURRENT_COURSE.is_target(self.key)
 
     @property
     def relative_path(self):
@@ -105,28 +151,47 @@ class Courses():
         :param path: path to read courses from
         """
 
-        course_directories = [x for x in recursive_iterdir(
-            path) if x.is_dir() and Course.is_course(x)]
+        course_directories = scan_workspace(path).courses
         _courses = [Course(path) for path in course_directories]
         return sorted(_courses, key=lambda c: c.name)
 
     def __init__(self, semester_path=CURRENT_SEMESTER_SYMLINK):
         self.path = semester_path
         self._courses = []  # lazy loading
-        self.read_current_course()  # ensure that the current course is set correctly
+        self._by_key = None
+        self._checked_current = False
+
+    @classmethod
+    def from_index(cls, index, semester_path=CURRENT_SEMESTER_SYMLINK):
+        'The courses of a semester, as recorded in a WorkspaceIndex.'
+        courses = cls(semester_path)
+        courses._courses = index.courses(semester_path)
+        return courses
 
     def __iter__(self):
         if not self._courses:
             self._courses = Courses.read_files(self.path)
+            self._by_key = None
         yield from self._courses
 
+    def refresh(self):
+        'Forget the courses, so that they are read again on next use.'
+        self._courses = []
+        self._by_key = None
+        self._checked_current = False
+
     @property
     def current(self):
-        for course in self:
-            if course.is_activated:
-                return course
-        raise FileNotFoundError(
-            'No current course is returned. The semester is empty.')
+        if not self._checked_current:
+            self.read_current_course()  # ensure that the current course is set correctly
+            self._checked_current = True
+        if self._by_key is None:
+            self._by_key = {course.key: course for course in self}
+        course = self._by_key.get(CURRENT_COURSE.key())
+        if course is None:
+            raise FileNotFoundError(
+                'No current course is returned. The semester is empty.')
+        return course
 
     @current.setter
     def current(self, course):
@@ -171,10 +236,13 @@ class Courses():
 
 
 class Semester():
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, course_paths: List[Path] = None):
+        'course_paths are the course directories of the semester, if they are already known.'
         self.path = path
         self.name = path.parent.stem + '/' + path.stem
+        self._course_paths = course_paths
         self._courses = []  # lazy loading
+        self._key = None
 
     def __iter__(self):
         yield from self.courses
@@ -182,29 +250,28 @@ class Semester():
     @property
     def courses(self):
         if len(self._courses) == 0:
-            self._courses = Courses.read_files(self.path)
+            if self._course_paths is not None:
+                self._courses = sorted((Course(path) for path in self._course_paths),
+                                       key=lambda c: c.name)
+            else:
+                self._courses = Courses.read_files(self.path)
         return self._courses
 
+    @property
+    def key(self):
+        'The (st_dev, st_ino) identity of the semester directory.'
+        if self._key is None:
+            self._key = file_key(self.path)
+        return self._key
+
     @property
     def is_current(self):
-        return os.path.samefile(self.path, CURRENT_SEMESTER_SYMLINK)
+        return CURRENT_SEMESTER.is_target(self.key)
 
     @property
     def relative_path(self):
         return self.path.relative_to(ROOT)
 
-    @staticmethod
-    def is_semester(path: Path):
-        if path.is_dir():
-            if len(list(filter(lambda x: x.is_dir(), path.iterdir()))) == 0:  # Empty semester
-                # empty directory with preamble.tex is a semester
-                return (path/'preamble.tex').exists() and not (path / 'master.tex').exists()
-            dirs = filter(lambda x: x.is_dir(), path.iterdir())
-            for p in dirs:
-                if Course.is_course(p):
-                    return True  # directory with a course is a semester
-        return False
-
 
 class Semesters():
 
@@ -234,25 +301,41 @@ class Semesters():
         """
         Read all semesters in ROOT
         """
-        semester_directories = [x for x in recursive_iterdir(
-            ROOT) if not x.is_symlink() and Semester.is_semester(x)]
-        _semesters = [Semester(path) for path in semester_directories]
+        scan = scan_workspace(ROOT)
+        _semesters = [Semester(path, course_paths)
+                      for path, course_paths in scan.semesters.items()]
         return sorted(_semesters, key=lambda s: s.name)
 
     def __init__(self):
         self._semesters = []  # lazy loading
+        self._by_key = None
+
+    @classmethod
+    def from_index(cls, index):
+        'The semesters, as recorded in a WorkspaceIndex.'
+        semesters = cls()
+        semesters._semesters = index.semesters()
+        return semesters
 
     def __iter__(self):
         if self._semesters == []:
             self._semesters = Semesters.read_files()
+            self._by_key = None
         yield from self._semesters
 
+    def refresh(self):
+        'Forget the semesters, so that they are read again on next use.'
+        self._semesters = []
+        self._by_key = None
+
     @property
     def current(self):
-        for semester in self:
-            if semester.is_current:
-                return semester
-        raise FileNotFoundError('No current semester')
+        if self._by_key is None:
+            self._by_key = {semester.key: semester for semester in self}
+        semester = self._by_key.get(CURRENT_SEMESTER.key())
+        if semester is None:
+            raise FileNotFoundError('No current semester')
+        return semester
 
     @current.setter
     def current(self, semester: Semester):
@@ -265,8 +348,14 @@ class Semesters():
             return False
 
 
-# Semesters of the current semester, as a default.
-semesters = Semesters()
-
-# Courses of the current semester, as a default.
-courses = Courses()
+def __getattr__(name):
+    # the default `semesters` and `courses` are created on first access
+    if name == 'semesters':
+        # Semesters of the current semester, as a default.
+        globals()['semesters'] = Semesters()
+        return globals()['semesters']
+    if name == 'courses':
+        # Courses of the current semester, as a default.
+        globals()['courses'] = Courses()
+        return globals()['courses']
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
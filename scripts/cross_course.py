@@ -0,0 +1,242 @@
+''' Queries over the documents of many courses, and the digest master.tex
+that compiles their result.
+
+A query is a range string of `range_query`, evaluated in every course,
+with a few additions:
+
+    all lecture this week
+    last lab in every course
+    lecture 1-3 in algebra topology
+    all homework last week, sorted by date
+
+`this week`, `last week` and `next week` stand for the week clause of the
+current week, as `get_week` counts it, and `in <course> ...` restricts
+the query to the named courses, ignoring case. `in every course`
+(or `in all courses`) is the default.
+
+Queries are resolved against a `DocumentBuckets`, built from the
+`WorkspaceIndex` without reading any document: the documents of every
+course, and the documents of every week bucketed by type.
+'''
+
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import get_week
+from index_table import IndexTable
+from lectures import MultiIndexSystem, parse_date
+from range_query import All, RangeError, RangePlan, compile_range
+from utils import atomic_write_text
+
+RELATIVE_WEEKS = {'this': 0, 'last': -1, 'next': 1}
+RELATIVE_WEEK_RE = re.compile(r'\b(this|last|next)\s+week\b')
+SCOPE_RE = re.compile(r'\s+in\s+([a-z0-9_\- ]+)$')
+EVERY_COURSE = ['every course', 'all courses', 'all', 'every']
+
+
+class CrossCourseQuery(NamedTuple):
+    plan: RangePlan
+    courses: Optional[Tuple[str, ...]] = None  # the words of the scope, or None for every course
+
+
+def relative_week(week: int, offset: int) -> int:
+    ''' The week offset weeks from week, wrapped around the turn of the
+    year as `get_week` does. A week without documents matches none.'''
+    return (week + offset) % 52
+
+
+def parse_query(string: str, week: int = None) -> CrossCourseQuery:
+    ''' Parse a query over many courses. week is the current week, by
+    default the week of today. Raise a RangeSyntaxError if it is invalid.'''
+    string = string.strip().lower()
+    week = get_week() if week is None else week
+
+    courses = None
+    m = SCOPE_RE.search(string)
+    if m:
+        scope = ' '.join(m.group(1).split())
+        if scope not in EVERY_COURSE:
+            courses = tuple(scope.split())
+        string = string[:m.start()]
+
+    # `this week` is the clause `week N` of the range language
+    string = RELATIVE_WEEK_RE.sub(
+        lambda m: ', week {}'.format(relative_week(week, RELATIVE_WEEKS[m.group(1)])), string)
+    return CrossCourseQuery(compile_range(string), courses)
+
+
+class Document(NamedTuple):
+    course: Path
+    course_name: str
+    index: object  # MultiIndexSystem.DocIndex
+    date: str
+    title: str
+    week: int
+
+    @property
+    def file_path(self) -> Path:
+        return self.course / self.index.to_filename()
+
+
+class DocumentBuckets():
+    ''' The documents of many courses, as recorded in a WorkspaceIndex,
+    with an IndexTable per course for the ranges and the rows of every
+    (week, type) bucket for the week filters.'''
+
+    index_system = MultiIndexSystem()
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self.courses: Dict[Path, IndexTable] = {}
+        self.names: Dict[Path, str] = {}
+        self.rows: Dict[Tuple[Path, object], int] = {}
+        self.weeks: Dict[int, Dict[str, List[int]]] = {}  # week -> type -> rows
+        by_course: Dict[Path, list] = {}
+        for row, doc in enumerate(documents):
+            by_course.setdefault(doc.course, []).append(doc.index)
+            self.names[doc.course] = doc.course_name
+            self.rows[(doc.course, doc.index)] = row
+            self.weeks.setdefault(doc.week, {}).setdefault(doc.index[0], []).append(row)
+        self.courses = {course: IndexTable(indices) for course, indices in by_course.items()}
+
+    @classmethod
+    def from_index(cls, index, semester: Path = None) -> 'DocumentBuckets':
+        'The documents of a semester, or of all semesters, in a WorkspaceIndex.'
+        index.refresh()
+        return cls([
+            Document(Path(row['course']), row['course_name'],
+                     cls.index_system.DocIndex((row['type'], row['number'])),
+                     row['date'], row['title'], row['week'])
+            for row in index.query_documents(semester=semester)])
+
+    def in_scope(self, words: Tuple[str, ...]) -> List[Path]:
+        ''' The courses named in the words of a scope, ignoring case. Names
+        may have spaces; the longest names are matched first, so that
+        `linear algebra` does not also select `algebra`.'''
+        scope = ' ' + ' '.join(words) + ' '
+        courses = []
+        for course in sorted(self.courses, key=lambda course: -len(self.names[course])):
+            name = ' ' + ' '.join(self.names[course].lower().split()) + ' '
+            if name in scope:
+                courses.append(course)
+                scope = scope.replace(name, ' ')
+        return [course for course in self.courses if course in courses]
+
+    def in_weeks(self, weeks: Tuple[int, int], type_name: str = None) -> List[int]:
+        'The rows of the documents in weeks [first, last], of one type or of all types.'
+        rows = []
+        for week in range(weeks[0], weeks[1] + 1):
+            buckets = self.weeks.get(week, {})
+            if type_name is None:
+                for type_rows in buckets.values():
+                    rows += type_rows
+            else:
+                rows += buckets.get(type_name, [])
+        return sorted(rows)
+
+    def resolve(self, query: CrossCourseQuery) -> List[Document]:
+        ''' The documents matching the query. A course in which the query
+        cannot be resolved, e.g. `last lab` in a course without labs,
+        contributes nothing.'''
+        plan = query.plan
+        courses = list(self.courses) if query.courses is None else self.in_scope(query.courses)
+        clauses = plan.clauses or ((All(),) if plan.weeks else ())
+
+        if plan.weeks and all(isinstance(clause, All) for clause in clauses):
+            # straight from the week buckets
+            allowed = set(courses)
+            rows = []
+            for type_name in sorted(set(clause.type_name for clause in clauses), key=str):
+                rows += self.in_weeks(plan.weeks, type_name)
+            rows = [row for row in sorted(set(rows)) if self.documents[row].course in allowed]
+        else:
+            in_weeks = set(self.in_weeks(plan.weeks)) if plan.weeks else None
+            rows = []
+            for course in courses:
+                table = self.courses[course]
+                indices = []
+                try:
+                    for clause in clauses:
+                        indices.extend(clause.evaluate(self.index_system, table))
+                except (RangeError, ValueError):
+                    continue
+                for index in indices:
+                    row = self.rows.get((course, index))
+                    if row is not None and (in_weeks is None or row in in_weeks):
+                        rows.append(row)
+
+        documents = [self.documents[row] for row in rows]
+        if plan.sort:
+            documents = self.sort(documents, plan.sort.keys)
+        return documents
+
+    @staticmethod
+    def sort(documents: List[Document], keys) -> List[Document]:
+        'Sort by keys, a list of (key, descending) with the most significant first.'
+        sort_keys = {
+            'date': lambda doc: parse_date(doc.date),
+            'title': lambda doc: doc.title,
+            'week': lambda doc: doc.week,
+            'index': lambda doc: (doc.index[0], doc.index[1]),
+        }
+        for key, descending in reversed(keys):
+            documents = sorted(documents, key=sort_keys[key], reverse=descending)
+        return documents
+
+
+class Digest():
+    ''' A generated master.tex, which `\\subimport`s documents of many
+    courses, under a section per course.'''
+
+    def __init__(self, path: Path, preamble: Path):
+        self.path = path  # the directory of the digest
+        self.preamble = preamble
+        self.master_file = path / 'master.tex'
+
+    def relative(self, path: Path) -> str:
+        # resolved, as LaTeX follows the symlinks of the workspace
+        return Path(os.path.relpath(str(path.resolve()), str(self.path.resolve()))).as_posix()
+
+    def render(self, documents: List[Document], title: str) -> str:
+        lines = [r'%&pdflatex',
+                 r'\documentclass[a4paper]{article}',
+                 r'\input{' + self.relative(self.preamble) + '}',
+                 r'\usepackage{import}',
+                 r'\title{' + title + '}',
+                 r'\begin{document}',
+                 r'    \maketitle',
+                 r'    \tableofcontents',
+                 r'    % start lectures']
+        course = None
+        for doc in documents:
+            if doc.course != course:
+                course = doc.course
+                lines.append(r'    \section*{' + doc.course_name + '}')
+            lines.append(r'    \subimport{' + self.relative(doc.course) + '/}{' + doc.index.to_filename() + '}')
+        lines += [r'    % end lectures',
+                  r'\end{document}',
+                  '']
+        return '\n'.join(lines)
+
+    def write(self, documents: List[Document], title: str = 'Digest') -> bool:
+        'Write the digest of documents. Return whether master.tex changed.'
+        text = self.render(documents, title)
+        try:
+            if self.master_file.read_text() == text:
+                return False
+        except FileNotFoundError:
+            self.path.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.master_file, text)
+        return True
+
+    def compile(self) -> int:
+        'Compile the digest with latexmk. Return its exit code.'
+        return subprocess.run(
+            ['latexmk', '-f', '-interaction=nonstopmode', str(self.master_file)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd=str(self.path)
+        ).returncode
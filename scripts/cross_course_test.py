@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from cross_course import Document, DocumentBuckets, parse_query, relative_week
+
+INDEX = DocumentBuckets.index_system.DocIndex
+
+
+def make_buckets() -> DocumentBuckets:
+    documents = []
+    for name, weeks in [('MATH110', [1, 2, 3]), ('Linear Algebra', [2, 3]), ('Algebra', [3])]:
+        for number, week in enumerate(weeks, 1):
+            documents.append(Document(Path('/univ') / name.replace(' ', '-'), name,
+                                      INDEX(('lecture', number)), '', 'Lecture {}'.format(number), week))
+    return DocumentBuckets(documents)
+
+
+def resolve(query: str, week: int = 3):
+    return [(doc.course_name, doc.index[1])
+            for doc in make_buckets().resolve(parse_query(query, week))]
+
+
+def test_scope():
+    assert parse_query('last lecture in MATH110', 3).courses == ('math110',)
+    assert resolve('last lecture in MATH110') == [('MATH110', 3)]
+    assert resolve('last lecture in math110 algebra') == [('MATH110', 3), ('Algebra', 1)]
+    # the longest name first, which does not select the shorter one
+    assert resolve('last lecture in linear algebra') == [('Linear Algebra', 2)]
+    assert resolve('last lecture in unknown') == []
+
+
+def test_every_course():
+    everything = [('MATH110', 3), ('Linear Algebra', 2), ('Algebra', 1)]
+    assert resolve('last lecture') == everything
+    assert resolve('last lecture in every course') == everything
+    assert resolve('last lecture in all courses') == everything
+
+
+def test_relative_weeks():
+    assert resolve('all lecture this week') == [('MATH110', 3), ('Linear Algebra', 2), ('Algebra', 1)]
+    assert resolve('all lecture last week in math110') == [('MATH110', 2)]
+    # the week itself, even past the documents of the semester
+    assert parse_query('all lecture next week', 3).plan.weeks == (4, 4)
+    assert resolve('all lecture next week') == []
+    assert resolve('all lecture last week', 1) == []
+    # wrapped around the turn of the year like get_week
+    assert relative_week(0, -1) == 51
+    assert relative_week(51, 1) == 0
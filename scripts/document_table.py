@@ -0,0 +1,114 @@
+from functools import cached_property
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from index_table import split_index
+
+
+class DocumentTable():
+    ''' A columnar view of the metadata of the documents of a course:
+    a type code, number, date, week and title column, one row per document.
+    Sorting and filtering run as vectorized operations on the columns.
+
+    The columns are built on first use, which reads the defline of every
+    document that is not in the cache yet.'''
+
+    def __init__(self, documents: Sequence):
+        self.documents = documents
+
+    @cached_property
+    def indices(self) -> list:
+        return [doc.index for doc in self.documents]
+
+    @cached_property
+    def rows(self) -> dict:
+        'The row of every index.'
+        return {index: row for row, index in enumerate(self.indices)}
+
+    @cached_property
+    def type_names(self) -> List[str]:
+        'The type name of every type code.'
+        return sorted(set(split_index(i)[0] or '' for i in self.indices))
+
+    @cached_property
+    def types(self) -> np.ndarray:
+        codes = {name: code for code, name in enumerate(self.type_names)}
+        return np.array([codes[split_index(i)[0] or ''] for i in self.indices], dtype=np.int32)
+
+    @cached_property
+    def numbers(self) -> np.ndarray:
+        return np.array([split_index(i)[1] for i in self.indices], dtype=np.int64)
+
+    @cached_property
+    def dates(self) -> np.ndarray:
+        return np.array([doc.date for doc in self.documents], dtype='datetime64[m]')
+
+    @cached_property
+    def weeks(self) -> np.ndarray:
+        return np.array([doc.week for doc in self.documents], dtype=np.int32)
+
+    @cached_property
+    def titles(self) -> np.ndarray:
+        return np.array([doc.title for doc in self.documents], dtype=object)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def column(self, key: str) -> List[np.ndarray]:
+        'The columns to order by for a sort key, the most significant first.'
+        if key == 'index':
+            return [self.types, self.numbers]
+        if key == 'date':
+            return [self.dates.view(np.int64)]
+        if key == 'week':
+            return [self.weeks]
+        if key == 'title':
+            # rank the titles, so that they can be negated like numbers
+            return [np.unique(self.titles.astype(str), return_inverse=True)[1].ravel()]
+        raise ValueError('Unknown sort key: {}'.format(key))
+
+    def rows_of(self, indices: Iterable) -> np.ndarray:
+        'The rows of the given indices, -1 for an index without a document.'
+        return np.fromiter((self.rows.get(i, -1) for i in indices), dtype=np.int64)
+
+    def mask(self, type_name: str = None, weeks: Tuple[int, int] = None) -> np.ndarray:
+        'A boolean mask of the rows of the given type and within the given weeks.'
+        mask = np.ones(len(self), dtype=bool)
+        if type_name is not None:
+            if type_name not in self.type_names:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.types == self.type_names.index(type_name)
+        if weeks is not None:
+            mask &= (self.weeks >= weeks[0]) & (self.weeks <= weeks[1])
+        return mask
+
+    def select(self, mask: np.ndarray) -> list:
+        return [self.indices[row] for row in np.flatnonzero(mask)]
+
+    def filter(self, indices: Sequence, type_name: str = None, weeks: Tuple[int, int] = None) -> list:
+        'Keep the indices of documents of the given type and within the given weeks.'
+        if not len(self):
+            return []
+        rows = self.rows_of(indices)
+        keep = (rows >= 0) & self.mask(type_name, weeks)[rows]
+        return [index for index, kept in zip(indices, keep) if kept]
+
+    def order(self, rows: np.ndarray, keys: Sequence[Tuple[str, bool]]) -> np.ndarray:
+        ''' The permutation that sorts rows by keys, a list of (key, descending)
+        with the most significant key first. The sort is stable, and rows
+        without a document (-1) are kept at the end.'''
+        sort_keys = [rows < 0]  # missing rows last
+        for key, descending in keys:
+            for column in self.column(key):
+                values = column[rows].astype(np.int64)
+                sort_keys.append(-values if descending else values)
+        # lexsort sorts by the last key first
+        return np.lexsort(sort_keys[::-1])
+
+    def sort(self, indices: Sequence, keys: Sequence[Tuple[str, bool]]) -> list:
+        'Sort the indices by keys, a list of (key, descending).'
+        if not indices or not len(self):
+            return list(indices)
+        rows = self.rows_of(indices)
+        return [indices[i] for i in self.order(rows, keys)]
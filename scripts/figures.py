@@ -0,0 +1,112 @@
+import hashlib
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import List, NamedTuple, Sequence
+
+from config import FIGURE_EXPORT_COMMAND, FIGURES_CACHE_NAME
+from stat_cache import StatCache
+
+
+class FigureExport(NamedTuple):
+    figure: str  # the name of the .svg
+    returncode: int
+    seconds: float
+    error: str = ''  # the output of a failed export
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+class Figures():
+    ''' The Inkscape figures of a course: every .svg in its figures/
+    directory, exported next to it as a .pdf and a .pdf_tex.
+
+    A figure is exported again when its exports are missing, or when the
+    content hash of the .svg differs from the one its exports were built
+    from. The hashes live in a StatCache in the figures directory: the hash
+    of every .svg keyed by its own stat, and the hash the exports were built
+    from keyed by the stat of the exported .pdf, so editing or deleting an
+    export also triggers a new one.
+
+    The export runs `command`, a list of arguments in which {svg}, {pdf}
+    and {pdf_tex} are replaced by the paths of the figure.'''
+
+    EXPORTS = ['.pdf', '.pdf_tex']
+
+    def __init__(self, path: Path, command: Sequence[str] = FIGURE_EXPORT_COMMAND):
+        self.path = path
+        self.command = list(command)
+        self.cache = StatCache(path / FIGURES_CACHE_NAME)
+
+    def svgs(self) -> List[Path]:
+        try:
+            with os.scandir(self.path) as entries:
+                return sorted(Path(entry.path) for entry in entries
+                              if entry.name.endswith('.svg') and entry.is_file())
+        except FileNotFoundError:
+            return []
+
+    def digest(self, svg: Path) -> str:
+        st = svg.stat()
+        digest = self.cache.get(svg.name, st)
+        if digest is None:
+            digest = hashlib.blake2b(svg.read_bytes(), digest_size=16).hexdigest()
+            self.cache.put(svg.name, st, digest)
+        return digest
+
+    def is_fresh(self, svg: Path) -> bool:
+        'Were the exports of svg built from its current content?'
+        exports = [svg.with_suffix(suffix) for suffix in self.EXPORTS]
+        if not all(export.exists() for export in exports):
+            return False
+        return self.cache.get(exports[0].name, exports[0].stat()) == self.digest(svg)
+
+    def stale(self) -> List[Path]:
+        'The figures whose exports are missing or out of date.'
+        stale = [svg for svg in self.svgs() if not self.is_fresh(svg)]
+        self.cache.save()
+        return stale
+
+    def has_converter(self) -> bool:
+        'Is the program of the command installed?'
+        return shutil.which(self.command[0]) is not None
+
+    def arguments(self, svg: Path) -> List[str]:
+        paths = {'svg': str(svg), 'pdf': str(svg.with_suffix('.pdf')),
+                 'pdf_tex': str(svg.with_suffix('.pdf_tex'))}
+        return [argument.format(**paths) for argument in self.command]
+
+    def export(self, svg: Path) -> FigureExport:
+        'Export one figure. Never raises.'
+        start = perf_counter()
+        try:
+            result = subprocess.run(self.arguments(svg), cwd=str(self.path),
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    universal_newlines=True)
+        except OSError as e:  # e.g. the converter is not installed
+            return FigureExport(svg.name, -1, perf_counter() - start, repr(e))
+        error = '' if result.returncode == 0 else result.stdout.strip()
+        return FigureExport(svg.name, result.returncode, perf_counter() - start, error)
+
+    def build(self, jobs: int = None) -> List[FigureExport]:
+        ''' Export the stale figures on a pool of jobs workers, which defaults
+        to the number of cores. Return the result of every export.'''
+        stale = self.stale()
+        if not stale:
+            return []
+        # the hashes before the export, in case a figure is edited meanwhile
+        digests = [self.digest(svg) for svg in stale]
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            results = list(pool.map(self.export, stale))
+
+        for svg, digest, result in zip(stale, digests, results):
+            pdf = svg.with_suffix('.pdf')
+            if result.ok and pdf.exists():
+                self.cache.put(pdf.name, pdf.stat(), digest)
+        self.cache.save()
+        return results
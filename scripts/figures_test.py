@@ -0,0 +1,119 @@
+''' The figure export pipeline, with a stub converter instead of Inkscape.
+The stub copies the .svg to the .pdf, writes a .pdf_tex and logs every call.
+'''
+
+import os
+import sys
+from pathlib import Path
+
+from figures import Figures
+
+STUB_CONVERTER = '''
+import sys
+from pathlib import Path
+svg, pdf, pdf_tex, log = map(Path, sys.argv[1:])
+if b'broken' in svg.read_bytes():
+    sys.exit('cannot export ' + svg.name)
+pdf.write_bytes(svg.read_bytes())
+pdf_tex.write_text('pdf_tex of ' + svg.name)
+with log.open('a') as f:
+    f.write(svg.name + '\\n')
+'''
+
+
+def make_figures(tmp_path: Path, names) -> Figures:
+    figures = tmp_path / 'figures'
+    figures.mkdir(exist_ok=True)
+    for name in names:
+        (figures / (name + '.svg')).write_text('<svg>{}</svg>'.format(name))
+    stub = tmp_path / 'stub.py'
+    stub.write_text(STUB_CONVERTER)
+    command = [sys.executable, str(stub), '{svg}', '{pdf}', '{pdf_tex}', str(tmp_path / 'log')]
+    return Figures(figures, command)
+
+
+def exported(tmp_path: Path) -> list:
+    'The figures exported since the last call.'
+    log = tmp_path / 'log'
+    if not log.exists():
+        return []
+    names = sorted(log.read_text().split())
+    log.unlink()
+    return names
+
+
+def test_exports_missing_figures_in_parallel(tmp_path):
+    figures = make_figures(tmp_path, ['a', 'b', 'c'])
+    results = figures.build(jobs=3)
+    assert [r.figure for r in results] == ['a.svg', 'b.svg', 'c.svg']
+    assert all(r.ok for r in results)
+    assert exported(tmp_path) == ['a.svg', 'b.svg', 'c.svg']
+    assert (tmp_path / 'figures' / 'a.pdf').read_text() == '<svg>a</svg>'
+    assert (tmp_path / 'figures' / 'a.pdf_tex').exists()
+
+
+def test_up_to_date_figures_are_skipped(tmp_path):
+    make_figures(tmp_path, ['a', 'b']).build()
+    exported(tmp_path)
+    # a new process, with the hashes from the cache file
+    assert make_figures(tmp_path, []).build() == []
+    assert exported(tmp_path) == []
+
+
+def test_staleness_is_decided_by_content(tmp_path):
+    make_figures(tmp_path, ['a', 'b']).build()
+    exported(tmp_path)
+
+    figures_dir = tmp_path / 'figures'
+    # a new mtime with the same content does not export again
+    st = (figures_dir / 'a.svg').stat()
+    os.utime(figures_dir / 'a.svg', ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert make_figures(tmp_path, []).stale() == []
+
+    # new content does
+    (figures_dir / 'b.svg').write_text('<svg>changed</svg>')
+    figures = make_figures(tmp_path, [])
+    assert figures.stale() == [figures_dir / 'b.svg']
+    figures.build()
+    assert exported(tmp_path) == ['b.svg']
+
+
+def test_missing_or_edited_exports_are_rebuilt(tmp_path):
+    make_figures(tmp_path, ['a', 'b']).build()
+    exported(tmp_path)
+
+    figures_dir = tmp_path / 'figures'
+    (figures_dir / 'a.pdf_tex').unlink()
+    (figures_dir / 'b.pdf').write_text('edited by hand')
+    make_figures(tmp_path, []).build()
+    assert exported(tmp_path) == ['a.svg', 'b.svg']
+
+
+def test_failed_exports_are_retried(tmp_path):
+    figures = make_figures(tmp_path, ['good', 'broken'])
+    results = {r.figure: r for r in figures.build()}
+    assert results['good.svg'].ok
+    assert not results['broken.svg'].ok
+    assert 'cannot export broken.svg' in results['broken.svg'].error
+    exported(tmp_path)
+
+    figures = make_figures(tmp_path, [])
+    assert figures.stale() == [tmp_path / 'figures' / 'broken.svg']
+
+
+def test_missing_converter(tmp_path):
+    figures = make_figures(tmp_path, ['a'])
+    figures.command = [str(tmp_path / 'no-such-converter'), '{svg}']
+    result, = figures.build()
+    assert result.returncode == -1 and not result.ok
+
+
+def test_a_missing_converter_is_not_run(tmp_path, monkeypatch, caplog):
+    from lectures import Lectures
+    make_figures(tmp_path, ['a', 'b'])
+    assert make_figures(tmp_path, []).has_converter()
+    monkeypatch.setenv('PATH', str(tmp_path / 'empty'))
+    assert Lectures(tmp_path, use_cache=False).export_figures() == []
+    assert [record.getMessage() for record in caplog.records] == [
+        'inkscape is not installed, 2 figures are not exported']
+    assert not (tmp_path / 'figures' / 'a.pdf').exists()
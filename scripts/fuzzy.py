@@ -0,0 +1,168 @@
+''' Fuzzy ranking of menu options, in process.
+
+A query matches an option when its characters occur in the option in
+order, ignoring case. A match is scored by where the characters occur,
+at the start of words and in runs rather than scattered. The trigrams
+the two have in common add to that score, and so does how recently and
+how often the option was chosen.
+
+The index precomputes a bitmask of the characters of every option, which
+rules out most options before the subsequence is checked, and, for the
+first query long enough to have trigrams, the options of every trigram.
+'''
+
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from utils import atomic_write_text
+
+# the score of a matched character, and the bonus when it starts a word
+# or continues the previous match
+MATCH = 1
+WORD_START = 2
+CONSECUTIVE = 1
+# the score of a shared trigram, and of a maximal recency
+TRIGRAM = 1
+RECENCY = 4
+
+
+def trigrams(text: str) -> set:
+    text = ' ' + text.lower() + ' '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def char_mask(text: str) -> int:
+    mask = 0
+    for char in text.lower():
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+def is_subsequence(query: str, text: str, start: int = 0) -> bool:
+    for char in query:
+        if char != ' ':
+            start = text.find(char, start) + 1
+            if start == 0:
+                return False
+    return True
+
+
+def subsequence_score(query: str, text: str) -> Optional[float]:
+    ''' The score of the characters of query in text, both lower case, or
+    None if they do not occur in order. Every character is matched at its
+    next occurrence, or at a later one that starts a word if the rest of
+    the query still occurs after it.'''
+    score = 0
+    start = 0
+    previous = -2
+    for i, char in enumerate(query):
+        if char == ' ':
+            continue
+        position = text.find(char, start)
+        if position == -1:
+            return None
+        word_start = position
+        while word_start > 0 and text[word_start - 1].isalnum():
+            word_start = text.find(char, word_start + 1)
+        if word_start > position and is_subsequence(query[i + 1:], text, word_start + 1):
+            position = word_start
+        score += MATCH
+        if position == 0 or not text[position - 1].isalnum():
+            score += WORD_START
+        if position == previous + 1:
+            score += CONSECUTIVE
+        previous = position
+        start = position + 1
+    return score
+
+
+class FuzzyMatch(NamedTuple):
+    position: int  # of the option
+    score: float
+
+
+class FuzzyIndex():
+    'The options of a menu, indexed for fuzzy queries.'
+
+    def __init__(self, options: Sequence[str]):
+        self.options = list(options)
+        self.lowered = [option.lower() for option in self.options]
+        self.masks = [char_mask(option) for option in self.lowered]
+        self._trigrams: Dict[str, List[int]] = None
+
+    @property
+    def trigrams(self) -> Dict[str, List[int]]:
+        'The options of every trigram, built for the first query that has trigrams.'
+        if self._trigrams is None:
+            self._trigrams = {}
+            for position, option in enumerate(self.lowered):
+                for trigram in trigrams(option):
+                    self._trigrams.setdefault(trigram, []).append(position)
+        return self._trigrams
+
+    def rank(self, query: str, recency: Dict[str, float] = None, limit: int = None) -> List[FuzzyMatch]:
+        ''' The options matching query, best first, at most limit of them.
+        recency maps options to a number in [0, 1], 1 for the most recent.
+        An empty query matches every option, ranked by recency alone, and
+        options that score the same keep their order.'''
+        query = query.strip().lower()
+        recency = recency or {}
+        mask = char_mask(query.replace(' ', ''))
+
+        shared: Dict[int, int] = {}
+        for trigram in trigrams(query) if len(query) >= 3 else ():
+            for position in self.trigrams.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+
+        matches = []
+        for position, option in enumerate(self.lowered):
+            if self.masks[position] & mask != mask:
+                continue
+            score = subsequence_score(query, option)
+            if score is None:
+                continue
+            score += TRIGRAM * shared.get(position, 0) + RECENCY * recency.get(self.options[position], 0)
+            matches.append(FuzzyMatch(position, score))
+        matches.sort(key=lambda match: (-match.score, match.position))
+        return matches[:limit] if limit is not None else matches
+
+
+class MenuHistory():
+    ''' When and how often every option of the menu was chosen, kept in a
+    JSON file. The recency of an option decays with the days since it was
+    last chosen, and grows with how often it was.'''
+
+    HALF_LIFE_DAYS = 7
+    MAX_ENTRIES = 1000
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.entries: Dict[str, list] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}  # [last chosen, times chosen] of every option
+
+    def recency(self, now: float = None) -> Dict[str, float]:
+        'The recency of every option that was chosen, in [0, 1].'
+        now = time.time() if now is None else now
+        recency = {}
+        for option, (last, count) in self.entries.items():
+            decay = 0.5 ** (max(0, now - last) / 86400 / self.HALF_LIFE_DAYS)
+            recency[option] = decay * (1 - 1 / (1 + math.log1p(count)))
+        return recency
+
+    def record(self, option: str):
+        'Remember that option was chosen, and save. Never raises.'
+        last, count = self.entries.get(option, (0, 0))
+        self.entries[option] = [time.time(), count + 1]
+        if len(self.entries) > self.MAX_ENTRIES:
+            oldest = sorted(self.entries, key=lambda option: self.entries[option][0])
+            for option in oldest[:len(self.entries) - self.MAX_ENTRIES]:
+                del self.entries[option]
+        try:
+            atomic_write_text(self.path, json.dumps(self.entries))
+        except OSError:
+            pass  # e.g. the workspace does not exist
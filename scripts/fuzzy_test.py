@@ -0,0 +1,35 @@
+from fuzzy import FuzzyIndex, MenuHistory, subsequence_score
+
+OPTIONS = ['New Lecture', 'Lecture 1: Groups', 'Lecture 2: Rings', 'Open lab 1',
+           'Include lecture 1-3', 'Choose current course']
+
+
+def ranked(query, recency=None, limit=None):
+    index = FuzzyIndex(OPTIONS)
+    return [OPTIONS[match.position] for match in index.rank(query, recency, limit)]
+
+
+def test_subsequence():
+    assert subsequence_score('nl', 'new lecture') is not None
+    assert subsequence_score('ln', 'new lecture') is None
+    # a word start later on is preferred, as long as the rest still matches
+    assert subsequence_score('ab', 'xab a') is not None
+    assert subsequence_score('lg', 'lecture 1: groups') > subsequence_score('lg', 'long')
+
+
+def test_rank():
+    assert ranked('lec 2') == ['Lecture 2: Rings']
+    assert ranked('nl')[0] == 'New Lecture'
+    assert ranked('ccc') == ['Choose current course']
+    assert ranked('zzz') == []
+    # an empty query keeps the order
+    assert ranked('') == OPTIONS
+    assert ranked('', limit=2) == OPTIONS[:2]
+
+
+def test_recency(tmp_path):
+    history = MenuHistory(tmp_path / 'history.json')
+    history.record('Open lab 1')
+    recency = MenuHistory(tmp_path / 'history.json').recency()
+    assert ranked('', recency, limit=2) == ['Open lab 1', 'New Lecture']
+    assert ranked('l1', recency)[0] == 'Open lab 1'
@@ -0,0 +1,114 @@
+''' Import-time budget of the entry points.
+
+Every module is imported in a fresh interpreter with `python -X importtime`,
+with HOME pointing to an empty directory, so that an import which touches
+the workspace shows up as an error or as time over the budget.
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).parent
+
+# cumulative import time budget of each module, in microseconds
+IMPORT_BUDGET_US = {
+    'config': 50_000,
+    'courses': 150_000,
+    'lectures': 150_000,
+    'choose_courses': 200_000,
+    'choose_lectures': 200_000,
+    'choose_lectures_view': 200_000,
+    'choose_view_pdf': 200_000,
+    'batch_build': 200_000,
+    'workspace_index': 200_000,
+    # entry points
+    'chooses': 200_000,
+    'countdown': 500_000,
+}
+# entry points that are not importable modules, by file name. Those that do
+# their work at the top level, without a __main__ guard, are measured by
+# what their top level imports
+SCRIPT_BUDGET_US = {
+    'compile-all-masters.py': 200_000,
+}
+
+# loads a script as the module sys.argv[2] through the import system, so
+# that -X importtime reports it
+SCRIPT_LOADER = '''
+import ast, importlib.abc, importlib.util, sys
+path, name = sys.argv[1:]
+with open(path) as f:
+    tree = ast.parse(f.read(), path)
+guarded = any(isinstance(node, ast.If) and '__main__' in ast.dump(node.test) for node in tree.body)
+if not guarded:
+    tree.body = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+class ScriptLoader(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, fullname, target_path=None, target=None):
+        if fullname == name:
+            return importlib.util.spec_from_loader(name, self, origin=path)
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(compile(tree, path, 'exec'), module.__dict__)
+
+sys.meta_path.insert(0, ScriptLoader())
+__import__(name)  # the import statement, which -X importtime times
+'''
+
+
+def import_time_us(module: str, home: str, script: str = None) -> int:
+    ''' The cumulative import time of module, as reported by -X importtime.
+    With script, the file name of an entry point, module is the name it is
+    loaded as.'''
+    env = dict(os.environ, HOME=home)
+    if script is None:
+        args = ['-c', 'import ' + module]
+    else:
+        args = ['-c', SCRIPT_LOADER, str(SCRIPTS / script), module]
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        cwd=str(SCRIPTS), env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        if 'ModuleNotFoundError' in result.stderr:
+            pytest.skip('a dependency of {} is not installed'.format(script or module))
+        raise AssertionError('import {} failed:\n{}'.format(script or module, result.stderr))
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if fields[2].strip() == module:
+            return int(fields[1])
+    raise AssertionError('no import time reported for {}'.format(module))
+
+
+def check_budget(module: str, budget_us: int, script: str = None):
+    with tempfile.TemporaryDirectory() as home:
+        # import once to compile the bytecode of the dependencies
+        import_time_us(module, home, script)
+        elapsed = import_time_us(module, home, script)
+        name = script or module
+        assert elapsed <= budget_us, \
+            'import {} took {} ms, over the budget of {} ms'.format(
+                name, elapsed // 1000, budget_us // 1000)
+        assert os.listdir(home) == [], 'import {} wrote to the workspace'.format(name)
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGET_US))
+def test_import_time(module):
+    check_budget(module, IMPORT_BUDGET_US[module])
+
+
+@pytest.mark.parametrize('script', sorted(SCRIPT_BUDGET_US))
+def test_script_import_time(script):
+    module = 'script_' + Path(script).stem.replace('-', '_')
+    check_budget(module, SCRIPT_BUDGET_US[script], script)
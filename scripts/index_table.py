@@ -0,0 +1,116 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+
+def split_index(index) -> Tuple[str, int]:
+    'Return the (type, number) of an index. Linear indices have no type.'
+    if isinstance(index, tuple):
+        return index[0], index[1]
+    return None, index
+
+
+class IndexTable(list):
+    ''' The list of all DocIndex of a course, in creation order, with the
+    structures needed to answer lookups without scanning it:
+    the position of every index, and for every type the sorted numbers
+    together with the indices they belong to.
+
+    Mutate the table through `add` and `remove` only, so that the lookup
+    structures stay in sync with the list.'''
+
+    def __init__(self, indices: Iterable = ()):
+        super().__init__(indices)
+        self.rebuild()
+
+    @classmethod
+    def of(cls, indices: Iterable) -> 'IndexTable':
+        'Return indices as an IndexTable, building one only if necessary.'
+        return indices if isinstance(indices, cls) else cls(indices)
+
+    def rebuild(self):
+        self.positions: Dict[object, int] = {}
+        self.numbers: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, list] = {}
+        for position, index in enumerate(self):
+            self.positions.setdefault(index, position)
+        for index in sorted(self.positions):
+            type_name, number = split_index(index)
+            self.numbers.setdefault(type_name, []).append(number)
+            self.by_type.setdefault(type_name, []).append(index)
+
+    def __contains__(self, index):
+        try:
+            return index in self.positions
+        except TypeError:  # unhashable
+            return False
+
+    def position(self, index) -> int:
+        try:
+            return self.positions[index]
+        except (KeyError, TypeError):
+            raise ValueError('{} is not in the index table'.format(index))
+
+    def of_type(self, type_name: str) -> list:
+        'All indices of the given type, sorted by number.'
+        return self.by_type.get(type_name, [])
+
+    def between(self, type_name: str, start: int, end: int) -> list:
+        'The indices of the given type with a number in [start, end].'
+        numbers = self.numbers.get(type_name, [])
+        return self.of_type(type_name)[bisect_left(numbers, start):bisect_right(numbers, end)]
+
+    def span(self, start, end) -> list:
+        'The indices located between start and end in creation order, both included.'
+        return self[self.position(start):self.position(end) + 1]
+
+    def add(self, index, position: int = None):
+        ''' Append a new index, or insert it at position. Only the positions
+        of the indices after it change.'''
+        if position is None or position >= len(self):
+            self.append(index)
+            position = len(self) - 1
+        else:
+            self.insert(position, index)
+            for other, at in self.positions.items():
+                if at >= position:
+                    self.positions[other] = at + 1
+        if index in self.positions:
+            self.positions[index] = min(self.positions[index], position)
+            return
+        self.positions[index] = position
+        type_name, number = split_index(index)
+        numbers = self.numbers.setdefault(type_name, [])
+        at = bisect_left(numbers, number)
+        numbers.insert(at, number)
+        self.by_type.setdefault(type_name, []).insert(at, index)
+
+    def remove(self, index):
+        ''' Remove the first occurrence of index. Only the positions of the
+        indices after it change.'''
+        position = self.position(index)
+        del self[position]
+        if index in self[position:]:  # a duplicate, which is rare
+            self.rebuild()
+            return
+        del self.positions[index]
+        for other, at in self.positions.items():
+            if at > position:
+                self.positions[other] = at - 1
+        type_name, number = split_index(index)
+        at = self.by_type[type_name].index(index, bisect_left(self.numbers[type_name], number))
+        del self.numbers[type_name][at]
+        del self.by_type[type_name][at]
+        if not self.numbers[type_name]:
+            del self.numbers[type_name], self.by_type[type_name]
+
+    def replace(self, old, new):
+        'Replace old by new, in place.'
+        self[self.position(old)] = new
+        self.rebuild()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def copy(self) -> 'IndexTable':
+        return self.__class__(self)
+
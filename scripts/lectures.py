@@ -1,18 +1,53 @@
 #!/usr/local/bin/python3
 
 import locale
+import logging
+import mmap
+import os
 from pathlib import Path
 import re
 import subprocess
+import threading
+from bisect import bisect_left
 from datetime import datetime
 from typing import List, Tuple
 
-from config import DATE_FORMAT, get_week
+from config import (DATE_FORMAT, LECTURES_CACHE_NAME, MASTER_INCLUDE_MODE,
+                    get_week)
+from index_table import IndexTable
+from master_file import MasterFile
+from range_query import compile_range
+from stat_cache import StatCache
+from utils import atomic_write_text
 
 
-# TODO
-#locale.setlocale(locale.LC_TIME, "en_US.utf8")
-locale.setlocale(locale.LC_ALL, "en_US")
+# deflines are dated with English day and month names
+DATE_LOCALES = ['en_US', 'en_US.UTF-8', 'en_US.utf8', 'C']
+_date_locale_set = False
+
+
+def set_date_locale():
+    'Set the first available English locale, on the first date that is parsed or formatted.'
+    global _date_locale_set
+    if _date_locale_set:
+        return
+    _date_locale_set = True
+    for name in DATE_LOCALES:
+        try:
+            locale.setlocale(locale.LC_ALL, name)
+            return
+        except locale.Error:
+            pass
+
+
+def parse_date(date_str: str) -> datetime:
+    set_date_locale()
+    return datetime.strptime(date_str, DATE_FORMAT)
+
+
+def format_date(date: datetime) -> str:
+    set_date_locale()
+    return date.strftime(DATE_FORMAT)
 
 
 class DocIndexSystem():
@@ -38,7 +73,8 @@ class DocIndexSystem():
         raise NotImplementedError()
 
     @classmethod
-    def match_range(cls, string: str, all_index: List[DocIndex]) -> List[DocIndex]:
+    def match_range(cls, string: str, all_index: List[DocIndex], table=None) -> List[DocIndex]:
+        'table is the DocumentTable of the documents, used to sort and filter by metadata.'
         raise NotImplementedError()
 
     @staticmethod
@@ -103,7 +139,7 @@ class LinearLectureIndexSystem(DocIndexSystem):
         return '\\lecture' + '{' + str(index) + '}' + '{' + date + '}' + '{' + title + '}'
 
     @classmethod
-    def match_range(cls, string: str, all_index: List[DocIndex]) -> List[DocIndex]:
+    def match_range(cls, string: str, all_index: List[DocIndex], table=None) -> List[DocIndex]:
         string = string.replace('current', 'last')  # an alias
 
         if 'all' in string:
@@ -114,8 +150,10 @@ class LinearLectureIndexSystem(DocIndexSystem):
         string = string.replace('last', str(all_index[-1]))
         string = string.replace('prev', str(all_index[-2]))
 
+        all_index_set = set(all_index)
+
         def filter(ls):
-            return [l for l in ls if l in all_index]
+            return [l for l in ls if l in all_index_set]
 
         if ',' in string:
             res = []
@@ -173,7 +211,7 @@ class MultiIndexSystem(DocIndexSystem):
                       'latest', 'next', 'previous', 'earliest',
                       'oldest', 'newest', 'sorted', 'by', 'date',
                       'title', 'desc', 'asc', 'descending', 'ascending',
-                      'time']
+                      'time', 'week', 'then']
     # current = last = latest = newest = end
     # first = earliest = oldest = start
     # prev = previous
@@ -259,195 +297,30 @@ class MultiIndexSystem(DocIndexSystem):
         return '\\{0}'.format(index[0]) + '{' + str(index[1]) + '}' + '{' + date + '}' + '{' + title + '}'
 
     @classmethod
-    def match_range(cls, string: str, all_index: List[DocIndex]) -> List[DocIndex]:
+    def match_range(cls, string: str, all_index: List[DocIndex], table=None) -> List[DocIndex]:
+        ''' Resolve a range string. Raise a RangeError if it is invalid.
+        The string is compiled once, see `range_query`. The `sorted by` and
+        `week` clauses are applied with the DocumentTable table.'''
         # example prompt:
         # lecture 1-5, lab 1, homework 2
         # lecture 1-5, lab 1-2, homework 2-last, current
         # last lecture, current
         # all lecture, all lab, sorted by date
-
-        def position_num(position_string: str, type_str: str) -> int:
-            ''' resolve the position string to a list of DocIndex '''
-
-            all_num = [i[1]
-                       for i in all_index if i[0] == type_str or not type_str]
-            position_string = position_string.strip()
-            if position_string in 'current last latest newest end'.split():
-                return all_num[-1]
-            elif position_string in 'first earliest oldest start'.split():
-                return all_num[0]
-            elif position_string in 'prev previous'.split():
-                try:
-                    return all_num[-2]
-                except IndexError:
-                    return all_num[-1]
-            elif position_string.isdigit():
-                # if int(position_string) in all_num:
-                return int(position_string)
-            return False
-
-        def parse_clause(spec_str) -> cls.DocIndex:
-            # replace any number of space with a single space
-            spec_str = re.sub(r'\s+', ' ', spec_str)
-
-            try:
-                start = spec_str.strip()
-                start_type, start_pos = start.split(' ')  # reverse order
-                start_num = position_num(start_pos, start_type)
-                start_index = cls.DocIndex((start_type, start_num))
-                return start_index
-            except:
-                pass
-            try:
-                start = spec_str.strip()
-                start_pos, start_type = start.split(' ')  # reverse order
-                start_num = position_num(start_pos, start_type)
-                start_index = cls.DocIndex((start_type, start_num))
-                return start_index
-            except:
-                pass
-            raise ValueError('Invalid spec: {0}'.format(spec_str))
-
-        def parse_complex_range(range_str) -> List[cls.DocIndex]:
-            # example prompt:
-            # lecture 1 - lecture 5
-            # lecture 1 - 5
-            # lecture 2 - lab 3
-            # 2 - lab 3
-            # 2 - 3
-
-            range_str = range_str.strip()
-            # TODO add something here to make it more tolerant to typos
-            try:
-                start, end = range_str.strip().split('-')
-                start_index = parse_clause(start)
-                end_index = parse_clause(end)
-                return cls.range(all_index, start_index, end_index)
-            except:
-                pass
-            try:  # assume it is of the form "1 - 5"
-                # use 'lecture' as a default type
-                start, end = range_str.split('-')
-                start = start.strip()
-                end = end.strip()
-                type_str = 'lecture'
-                return cls.range(all_index,
-                                 parse_clause(type_str + ' ' + start),
-                                 parse_clause(type_str + ' ' + end))
-
-            except:
-                pass
-            try:  # assume one side if a index and the other side is a number.
-                # apply the same type to both sides.
-                start, end = range_str.split('-')
-                start_index = end_index = None
-                try:
-                    start_index = parse_clause(start)
-                except:
-                    pass
-                try:
-                    end_index = parse_clause(end)
-                except:
-                    pass
-                if start_index:
-                    assert position_num(end, start_index[0])
-                    return cls.range(all_index, start_index,
-                                     parse_clause(start_index[0] + ' ' + str(position_num(end, start_index[0]))))
-                if end_index:
-                    assert position_num(start, end_index[0])
-                    return cls.range(all_index, parse_clause(end_index[0] + ' ' + str(position_num(start, end_index[0]))), end_index)
-            except:
-                pass
-            raise ValueError('Invalid range: {0}'.format(range_str))
-
-        def parse_sorting_info(sorting_sentence: str):
-            'Parse the sorting info. Return the sorter function that can be used to sort the list.'
-            # example prompt:
-            # sorted by date
-            # sorted by date desc
-            # sorted by title asc
-            assert 'sort' in sorting_sentence.lower()
-
-            reverse = False
-
-            sorting_sentence = (sorting_sentence
-                                .replace('sorted by', '')
-                                .replace('sorted', '')
-                                .replace('sort', '')
-                                .replace('by', '')
-                                .replace('asc', '')  # ascending is a default
-                                .strip())
-            if 'desc' in sorting_sentence:
-                reverse = True
-                sorting_sentence = sorting_sentence.replace('desc', '').strip()
-
-            # now it must be alphabetical
-            if not sorting_sentence.isalpha():
-                # return trivial sorter
-                raise ValueError(
-                    'Invalid sorting info: {0}'.format(sorting_sentence))
-
-            attr_name = sorting_sentence.lower()
-
-            def sort(documents: Lecture, reverse: bool = False) -> List[Lecture]:
-                'Sort the list of documents by the date.'
-                try:
-                    return sorted(documents, key=lambda x: getattr(x, attr_name), reverse=reverse)
-                except AttributeError:
-                    return documents
-            return sort
-
-        parsed_range = []
-        string = string.strip().lower()
-        def sorter(x): return x
-        for sentence in string.split(','):
-            sentence = sentence.strip()
-            # try to parse it as a sorting info
-            try:
-                sorter = parse_sorting_info(sentence)
-                continue
-            except:
-                pass
-            # try to parse it as an 'all' sentence. ex: all lecture, all lab, all homework
-            try:
-                assert 'all' in sentence
-                sentence = sentence.replace('all', '').strip()
-                type_str = sentence.lower()
-                assert type_str.isalpha() or not type_str
-                parsed_range.extend(
-                    [i for i in all_index if i[0] == type_str or not type_str])
-                continue
-            except:
-                pass
-            # try to parse it as a clause
-            try:
-                parsed_range.append(parse_clause(sentence))
-                continue
-            except:
-                pass
-            # try to parse it as a range
-            try:
-                parsed_range.extend(parse_complex_range(sentence))
-                continue
-            except ValueError:
-                pass
-            # do nothing with this command
-            # warn the user
-            print('Warning: invalid command: {0}'.format(sentence))
-
-        return parsed_range  # TODO sorter feature
+        plan = compile_range(string)
+        return plan.evaluate(cls, IndexTable.of(all_index), table)
 
     @classmethod
     def range(cls, all_indices: List[DocIndex], start: DocIndex, end: DocIndex) -> List[DocIndex]:
         'Return a list of indices in the range [start, end]'
+        all_indices = IndexTable.of(all_indices)
         # start and end are of the same type
         if start[0] == end[0]:
-            return [i for i in all_indices if i[0] == start[0] and i[1] >= start[1] and i[1] <= end[1]]
+            return all_indices.between(start[0], start[1], end[1])
         else:
             # the items located between start and end in all_indices
             try:
-                return all_indices[all_indices.index(start):all_indices.index(end)+1]
-            except IndexError:
+                return all_indices.span(start, end)
+            except ValueError:
                 raise ValueError('start and end must be in all_index')
 
     @classmethod
@@ -457,7 +330,7 @@ class MultiIndexSystem(DocIndexSystem):
                 type_str = 'lecture'
             else:
                 type_str = all_indices[-1][0]
-        matched_indices = [i for i in all_indices if i[0] == type_str]
+        matched_indices = IndexTable.of(all_indices).of_type(type_str)
         if not matched_indices:
             return cls.DocIndex((type_str, 1))
         else:
@@ -465,43 +338,112 @@ class MultiIndexSystem(DocIndexSystem):
 
 
 class Lecture():
-    def __init__(self, file_path: Path, index_system: DocIndexSystem):
-        # read index from filenumber
+    ''' A single document of a course.
+    The index is read from the filename. The date, title and week are read
+    from the defline only when one of them is first accessed, and only the
+    lines in the first HEADER_BYTES of the file are scanned for it.'''
+
+    __slots__ = ('index_system', 'index', 'file_path',
+                 '_date', '_title', '_week', '_on_load')
+
+    # the defline is expected near the top of the file
+    HEADER_BYTES = 4096
+
+    def __init__(self, file_path: Path, index_system: DocIndexSystem, info: list = None, on_load=None):
+        '''info is the cached (index, date, title, week) of the file, if known.
+        on_load is called with the lecture after its defline has been read.'''
         self.index_system = index_system
+        self.file_path = file_path
+        # read index from filenumber
         self.index: index_system.DocIndex = index_system.DocIndex.from_filename(
             file_path.stem)
+        self._on_load = on_load
 
-        with file_path.open('r+') as f:
-            for line in f:
-                try:
-                    index_str, date_str, title = index_system.parse_defline(
-                        line)
-                    break
-                except IndexError:
-                    pass
-            else:
-                # no match. create title line
+        if info is not None:
+            _, self._date, self._title, self._week = info  # date is parsed on access
+        else:
+            self._date = self._title = self._week = None
 
-                title_line = index_system.make_defline(
-                    self.index, datetime.now().strftime(DATE_FORMAT), '')
-                f.seek(0, 0)  # point to the beginning of the file
-                f.write(title_line)
+    @property
+    def date(self) -> datetime:
+        if self._title is None:
+            self._load()
+        if isinstance(self._date, str):
+            self._date = parse_date(self._date)
+        set_date_locale()  # for callers that format the date themselves
+        return self._date
 
-                index_str, date_str, title = index_system.parse_defline(
-                    title_line)
+    @property
+    def title(self) -> str:
+        if self._title is None:
+            self._load()
+        return self._title
 
-        date = datetime.strptime(date_str, DATE_FORMAT)
-        week = get_week(date)
+    @property
+    def week(self) -> int:
+        if self._title is None:
+            self._load()
+        return self._week
+
+    def read_header(self) -> bytes:
+        ''' Return the first HEADER_BYTES of the file, up to the end of the
+        line they end in, read through a read-only memory map.'''
+        with self.file_path.open('rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    end = m.find(b'\n', self.HEADER_BYTES - 1)
+                    return m[:end + 1 if end != -1 else len(m)]
+            except ValueError:  # an empty file cannot be mapped
+                return b''
+
+    def find_defline(self, header: bytes) -> List[str]:
+        'Return the parsed defline in the header, or None.'
+        for line in header.decode('utf-8', errors='replace').splitlines():
+            try:
+                return self.index_system.parse_defline(line)
+            except (AttributeError, IndexError):  # not a defline
+                pass
+        return None
+
+    def _load(self):
+        header = self.read_header()
+        parsed = self.find_defline(header)
+
+        if parsed is not None:
+            _, date_str, title = parsed
+            date = parse_date(date_str)
+        elif len(header) < self.HEADER_BYTES:
+            # the whole file was scanned and has no defline. create title line
+            date = datetime.now()
+            title = ''
+            title_line = self.index_system.make_defline(
+                self.index, format_date(date), title)
+            atomic_write_text(self.file_path, title_line + '\n' +
+                              header.decode('utf-8', errors='replace'))
+        else:
+            # a long document without a defline in its header is left untouched
+            logging.getLogger(self.__class__.__name__).warning(
+                'No defline in the first {} bytes of {}'.format(self.HEADER_BYTES, self.file_path))
+            date = datetime.fromtimestamp(self.file_path.stat().st_mtime)
+            title = ''
+
+        self._date = date
+        self._week = get_week(date)
+        self._title = title
+        if self._on_load is not None:
+            self._on_load(self)
 
-        self.file_path = file_path
-        self.date = date
-        self.week = week
-        self.title = title
+    @property
+    def info(self) -> list:
+        'The (index, date, title, week) of the document, as stored in the cache.'
+        return [self.index, format_date(self.date), self.title, self.week]
 
-    def edit(self):
+    def edit(self, line: int = None):
+        'Open the document in the editor, at line if given.'
         # TODO remember to set --servername in the editor synctex command also to `purdue`
+        goto = f" +{int(line)}" if line else ''
         subprocess.call([
-            f"source ~/.zshrc; mvim -c \"lcd {str(self.file_path.parent)}\" --servername purdue --remote-silent \"{str(self.file_path)}\"",
+            f"source ~/.zshrc; mvim -c \"lcd {str(self.file_path.parent)}\" --servername purdue --remote-silent{goto} \"{str(self.file_path)}\"",
         ], shell=True)
 
     def __str__(self):
@@ -509,13 +451,36 @@ class Lecture():
 
 
 class Lectures():
-    def __init__(self, path: Path, index_system: DocIndexSystem = MultiIndexSystem()):
+    def __init__(self, path: Path, index_system: DocIndexSystem = MultiIndexSystem(), use_cache: bool = True,
+                 include_mode: str = MASTER_INCLUDE_MODE, documents: List[Lecture] = None):
+        '''include_mode is how master.tex selects the documents, see `MasterFile`.
+        documents are the documents of the course sorted by index, if they are already known.'''
         self.path = path
         self.index_system = index_system
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # parsed deflines, keyed by the stat of each document
+        self.cache = StatCache(
+            self.path / LECTURES_CACHE_NAME) if use_cache else None
 
         self.master_file: Path = self.path / 'master.tex'
-        self.documents = self.read_files()
-        self.all_indices = [doc.index for doc in self.documents]
+        self.master = MasterFile(
+            self.master_file, self.index_system, include_mode)
+        self._build_cache = None  # lazy loading
+        self._lock = threading.RLock()  # for changes applied by the watcher
+        self._observer = None
+        self.set_documents(documents if documents is not None else self.read_files())
+
+    @classmethod
+    def from_index(cls, index, path: Path, **kwargs):
+        'The documents of a course, as recorded in a WorkspaceIndex.'
+        return index.lectures(path, **kwargs)
+
+    def set_documents(self, documents: List[Lecture]):
+        'Replace the documents, which must be sorted by index, and rebuild the lookup structures.'
+        self.documents = documents
+        self.all_indices = IndexTable(doc.index for doc in self.documents)
+        self._by_index = {doc.index: doc for doc in self.documents}
+        self._table = None  # lazy loading
 
     def __iter__(self):
         return iter(self.documents)
@@ -524,59 +489,83 @@ class Lectures():
         return len(self.documents)
 
     def get_from_index(self, index: DocIndexSystem.DocIndex):
-        for doc in self:
-            if doc.index == index:
-                return doc
+        return self._by_index.get(index)
 
     def read_files(self) -> List[Lecture]:
-        files = [file for file in self.path.iterdir(
-        ) if self.index_system.is_filename_valid(file.name)]
-        return sorted((Lecture(f, self.index_system) for f in files), key=lambda l: l.index)
+        'Read all documents. Only the documents that changed since the last call are parsed.'
+        with os.scandir(self.path) as entries:
+            files = [entry for entry in entries
+                     if self.index_system.is_filename_valid(entry.name)]
+
+        documents = [self.read_file(Path(entry.path), entry.stat())
+                     for entry in files]
+        if self.cache is not None:
+            self.cache.prune(entry.name for entry in files)
+            self.cache.save()
+        return sorted(documents, key=lambda l: l.index)
+
+    def read_file(self, file_path: Path, st: os.stat_result = None) -> Lecture:
+        if self.cache is None:
+            return Lecture(file_path, self.index_system)
+
+        st = st or file_path.stat()
+        info = self.cache.get(file_path.name, st)
+        if info is not None and len(info) == 4:
+            return Lecture(file_path, self.index_system, info)
+        # parsed lazily, and remembered once it is
+        return Lecture(file_path, self.index_system, on_load=self._remember)
+
+    def _remember(self, lecture: Lecture):
+        # the file is rewritten if it had no defline, so stat it again
+        self.cache.put(lecture.file_path.name,
+                       lecture.file_path.stat(), lecture.info)
+        self.cache.save_at_exit()
+
+    def reload(self):
+        'Read the documents again, e.g. after files were added outside of this object.'
+        with self._lock:
+            self.set_documents(self.read_files())
+
+    def invalidate_cache(self):
+        'Drop the cached metadata of this course. The next read parses every document.'
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    @property
+    def cache_stats(self) -> dict:
+        return self.cache.stats if self.cache is not None else {}
 
     def parse_range_string(self, string: str) -> List[DocIndexSystem.DocIndex]:
         all_index = self.all_indices
-        return self.index_system.match_range(string, all_index)
+        return self.index_system.match_range(string, all_index, self.table)
+
+    @property
+    def table(self):
+        'A columnar DocumentTable of the metadata of the documents, built on first use.'
+        if self._table is None:
+            from document_table import DocumentTable
+            self._table = DocumentTable(self.documents)
+        return self._table
 
     def parse_master_range(self, filepath) -> Tuple[str, List[DocIndexSystem.DocIndex], str]:
-        part = 0
-        header: str = ''
-        footer: str = ''
-        indices: List[DocIndexSystem.DocIndex] = []
-        with filepath.open() as f:
-            for line in f:
-                # order of if-statements is important here!
-                if 'end lectures' in line:
-                    part = 2
-
-                if part == 0:
-                    header += line
-                if part == 1:
-                    indices.append(self.index_system.DocIndex.from_filename(
-                        line.split('{')[1].split('}')[0]))
-                if part == 2:
-                    footer += line
-
-                if 'start lectures' in line:
-                    part = 1
-        return (header, indices, footer)
+        if filepath == self.master_file:
+            return self.master.read()
+        return MasterFile(filepath, self.index_system).read()
 
     @property
     def all_types(self) -> List[str]:
         return sorted(set(doc.index[0] for doc in self))
 
-    def update_docs_in_master(self, indices: List[DocIndexSystem.DocIndex]):
-        'master.tex will only include the lectures in indices'
-
-        header, _, footer = self.parse_master_range(self.master_file)
-        body = ''.join(
-            ' ' * 4 + r'\input{' + index.to_filename() + '}\n' for index in indices)
-        self.master_file.write_text(header + body + footer)
+    def update_docs_in_master(self, indices: List[DocIndexSystem.DocIndex]) -> bool:
+        '''master.tex will only include the lectures in indices.
+        Return whether master.tex changed; it is not written otherwise.'''
+        return self.master.write(indices, self.all_indices)
 
-    def update_master_from_range_string(self, string: str):
+    def update_master_from_range_string(self, string: str) -> bool:
         indices = self.parse_range_string(string)
-        self.update_docs_in_master(indices)
+        return self.update_docs_in_master(indices)
 
-    def new_doc(self, name, type_name='lecutre'):
+    def new_doc(self, name, type_name='lecture'):
         name = name.strip()
         assert type_name.isalpha()
 
@@ -587,26 +576,162 @@ class Lectures():
         assert not new_doc_path.exists()
 
         today = datetime.today()
-        date = today.strftime(DATE_FORMAT)
+        date = format_date(today)
 
         # write new document
         new_doc_path.touch()
         new_doc_path.write_text(
             self.index_system.make_defline(new_doc_index, date, name))
 
+        # add the new document, without reading the others again
+        lecture = self.add_file(new_doc_path)
+
         # update master.tex
         _, indices, _ = self.parse_master_range(self.master_file)
         self.update_docs_in_master(indices + [new_doc_index])
 
-        # reload documents to include the new document
-        self.__init__(self.path)
+        return lecture
 
-        return Lecture(new_doc_path, self.index_system)
+    def remove_doc(self, index: DocIndexSystem.DocIndex) -> Lecture:
+        'Delete a document and remove it from master.tex.'
+        lecture = self.get_from_index(index)
+        if lecture is None:
+            raise FileNotFoundError('No document {}'.format(index))
+
+        lecture.file_path.unlink(missing_ok=True)
+        self.discard_file(lecture.file_path)
+
+        _, indices, _ = self.parse_master_range(self.master_file)
+        self.update_docs_in_master([i for i in indices if i != index])
+        return lecture
+
+    def rename_doc(self, index: DocIndexSystem.DocIndex, new_index: DocIndexSystem.DocIndex) -> Lecture:
+        'Move a document to a new index, updating its defline and master.tex.'
+        lecture = self.get_from_index(index)
+        if lecture is None:
+            raise FileNotFoundError('No document {}'.format(index))
+        new_path = self.path / new_index.to_filename()
+        assert not new_path.exists()
+
+        defline = self.index_system.make_defline(
+            new_index, format_date(lecture.date), lecture.title)
+        lines = lecture.file_path.read_text().splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            try:
+                self.index_system.parse_defline(line)
+                lines[i] = defline + '\n'
+                break
+            except (AttributeError, IndexError):  # not a defline
+                pass
+        else:
+            lines.insert(0, defline + '\n')
+        atomic_write_text(new_path, ''.join(lines))
+        lecture.file_path.unlink()
+        self.discard_file(lecture.file_path)
+        new_lecture = self.add_file(new_path)
+
+        _, indices, _ = self.parse_master_range(self.master_file)
+        self.update_docs_in_master(
+            [new_index if i == index else i for i in indices])
+        return new_lecture
+
+    # incremental updates of the documents in memory
+
+    def add_file(self, file_path: Path) -> Lecture:
+        ''' Add a new or changed document file. The other documents are not
+        read again, and the lookup structures are updated in place.'''
+        with self._lock:
+            lecture = self.read_file(file_path)
+            # all_indices is in the order of the documents
+            position = bisect_left(self.all_indices, lecture.index)
+            if lecture.index in self._by_index:
+                self.documents[position] = lecture
+            else:
+                self.documents.insert(position, lecture)
+                self.all_indices.add(lecture.index, position)
+            self._by_index[lecture.index] = lecture
+            self._table = None
+            return lecture
+
+    def discard_file(self, file_path: Path):
+        'Forget a document file that no longer exists.'
+        with self._lock:
+            if self.cache is not None:
+                self.cache.discard(file_path.name)
+            index = self.index_system.DocIndex.from_filename(file_path.name)
+            lecture = self._by_index.get(index)
+            if lecture is None or lecture.file_path.name != file_path.name:
+                return
+            del self.documents[bisect_left(self.all_indices, index)]
+            self.all_indices.remove(index)
+            del self._by_index[index]
+            self._table = None
+
+    def apply_change(self, kind: str, file_path: Path, dest_path: Path = None):
+        ''' Apply a change made outside of this object to one file of the course.
+        kind is one of created, modified, deleted and moved.'''
+        if kind == 'moved':
+            self.apply_change('deleted', file_path)
+            if dest_path is not None:
+                self.apply_change('created', dest_path)
+            return
+        if not self.index_system.is_filename_valid(file_path.name):
+            return
+        file_path = self.path / file_path.name
+        if kind == 'deleted' or not file_path.exists():
+            self.discard_file(file_path)
+        else:
+            self.add_file(file_path)
+
+    def watch(self):
+        'Keep the documents up to date with the files of the course, until `unwatch` is called.'
+        from vimtex_popup.watch import watch_changes
+        if self._observer is None:
+            self._observer = watch_changes(self.path, self.apply_change)
+        return self._observer
+
+    def unwatch(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
 
     def clean_latexmk(self):
         subprocess.call(['latexmk', '-c'], cwd=str(self.path))
 
-    def compile_master(self):
+    @property
+    def build_cache(self):
+        if self._build_cache is None:
+            from build_cache import BuildCache
+            self._build_cache = BuildCache(self.path, self.master)
+        return self._build_cache
+
+    def export_figures(self) -> list:
+        'Export the figures whose .svg changed since they were last exported. Return a FigureExport for each.'
+        from figures import Figures
+        figures = Figures(self.path / 'figures')
+        if not figures.has_converter():
+            stale = figures.stale()
+            if stale:
+                self.logger.warning('{} is not installed, {} figures are not exported'.format(
+                    figures.command[0], len(stale)))
+            return []
+        results = figures.build()
+        for result in results:
+            if not result.ok:
+                self.logger.warning('Could not export figure {}: {}'.format(result.figure, result.error))
+        return results
+
+    def compile_master(self, force: bool = False):
+        ''' Compile master.tex, unless master.pdf was already built from the
+        same content of master.tex and every file it depends on.
+        Return a CompileResult, which tells whether the build was skipped.'''
+        from build_cache import CompileResult
+        self.export_figures()
+        digest = self.build_cache.inputs_digest()
+        if not force and self.build_cache.is_fresh(digest):
+            return CompileResult(0, cached=True)
+
         # self.clean_latexmk()
         result = subprocess.run(
             # ['pdflatex',str(self.master_file)],
@@ -616,7 +741,9 @@ class Lectures():
             stderr=subprocess.DEVNULL,
             cwd=str(self.path)
         )
-        return result.returncode
+        if result.returncode == 0:
+            self.build_cache.record(digest)
+        return CompileResult(result.returncode, cached=False)
 
     def open_pdf(self):
         if (self.path / 'master.pdf').exists():
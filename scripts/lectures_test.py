@@ -0,0 +1,83 @@
+''' Incremental updates of the documents of a course, which must leave the
+lookups as a fresh read of the directory would, and the lazy reading of
+the defline of a document. '''
+
+from pathlib import Path
+
+from lectures import Lecture, Lectures, MultiIndexSystem
+
+Index = MultiIndexSystem.DocIndex
+
+
+def write(course: Path, filename: str) -> Path:
+    path = course / filename
+    path.write_text('\\lecture{{{}}}{{Mon 01 Jan 2024 10:00}}{{{}}}\n'.format(filename[-6:-4], filename))
+    return path
+
+
+def lookups(lectures: Lectures) -> tuple:
+    table = lectures.all_indices
+    return ([doc.file_path.name for doc in lectures],
+            list(table), table.positions, table.numbers, table.by_type,
+            {index: doc.file_path.name for index, doc in lectures._by_index.items()},
+            lectures.all_types)
+
+
+def test_add_and_discard_keep_the_lookups_consistent(tmp_path):
+    for filename in ['lecture_01.tex', 'lecture_03.tex', 'lab_02.tex']:
+        write(tmp_path, filename)
+    lectures = Lectures(tmp_path, use_cache=False)
+
+    changes = [('add', 'lecture_02.tex'), ('add', 'lab_01.tex'), ('add', 'lecture_03.tex'),
+               ('add', 'homework_01.tex'), ('discard', 'lecture_01.tex'),
+               ('discard', 'homework_01.tex'), ('discard', 'lab_05.tex'), ('add', 'lecture_10.tex')]
+    for change, filename in changes:
+        if change == 'add':
+            lectures.add_file(write(tmp_path, filename))
+        else:
+            path = tmp_path / filename
+            if path.exists():
+                path.unlink()
+            lectures.discard_file(path)
+        assert lookups(lectures) == lookups(Lectures(tmp_path, use_cache=False)), (change, filename)
+
+    assert lectures.get_from_index(Index(('lecture', 2))).file_path.name == 'lecture_02.tex'
+    assert lectures.get_from_index(Index(('lecture', 1))) is None
+    assert lectures.all_indices.between('lecture', 2, 3) == [Index(('lecture', 2)), Index(('lecture', 3))]
+
+
+def lecture(path: Path, loaded: list) -> Lecture:
+    return Lecture(path, MultiIndexSystem(), on_load=loaded.append)
+
+
+def test_the_defline_is_read_on_first_access(tmp_path):
+    path = write(tmp_path, 'lecture_01.tex')
+    loaded = []
+    doc = lecture(path, loaded)
+    assert doc.index == Index(('lecture', 1)) and loaded == []
+    assert doc.title == 'lecture_01.tex'
+    assert doc.date.day == 1 and loaded == [doc]
+    # cached info is used without reading the file
+    doc = Lecture(tmp_path / 'lecture_02.tex', MultiIndexSystem(),
+                  [Index(('lecture', 2)), 'Mon 08 Jan 2024 10:00', 'Cached', 2])
+    assert (doc.title, doc.date.day, doc.week) == ('Cached', 8, 2)
+
+
+def test_a_header_longer_than_header_bytes(tmp_path, caplog):
+    preamble = '% ' + 'x' * (Lecture.HEADER_BYTES - 20) + '\n'
+    path = tmp_path / 'lecture_01.tex'
+    # the defline crosses HEADER_BYTES, and its line is read to the end
+    path.write_text(preamble + '\\lecture{1}{Mon 01 Jan 2024 10:00}{Groups}\n' + 'body\n' * 2000)
+    assert lecture(path, []).title == 'Groups'
+
+    # a defline after the header is not found, and the file is not rewritten
+    text = preamble * 3 + '\\lecture{1}{Mon 01 Jan 2024 10:00}{Groups}\n'
+    path.write_text(text)
+    assert lecture(path, []).title == ''
+    assert path.read_text() == text
+    assert 'No defline in the first {} bytes'.format(Lecture.HEADER_BYTES) in caplog.text
+
+    # a short file without one gets a defline
+    path.write_text('body\n')
+    assert lecture(path, []).title == ''
+    assert path.read_text().startswith('\\lecture{1}{')
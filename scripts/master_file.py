@@ -0,0 +1,122 @@
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from stat_cache import stat_key
+from utils import atomic_write_text
+
+INCLUDEONLY_RE = re.compile(r'^\s*\\includeonly\{(.*)\}\s*$')
+
+
+class MasterFile():
+    ''' The master.tex of a course, split into the header, the documents
+    included between `% start lectures` and `% end lectures`, and the footer.
+
+    In the default 'input' mode, the body `\\input`s exactly the documents
+    in the chosen range. In the 'includeonly' mode, the body `\\include`s
+    every document of the course and the range is set with an `\\includeonly`
+    line before `\\begin{document}`, so that LaTeX keeps the .aux file of the
+    documents it skips, and with it the numbering and cross-references. In
+    this mode the documents are always in course order, once each.
+
+    The parsed parts are kept in memory for as long as the file is unchanged
+    on disk. The file is only written when the included documents change,
+    through a temporary file and a rename.'''
+
+    MODES = ['input', 'includeonly']
+
+    def __init__(self, path: Path, index_system, mode: str = 'input'):
+        if mode not in self.MODES:
+            raise ValueError('Unknown master.tex mode: {}'.format(mode))
+        self.path = path
+        self.index_system = index_system
+        self.mode = mode
+        self._key = None
+        self._parts = None
+
+    def parts(self) -> Tuple[str, list, str, Optional[list]]:
+        'Return (header, body indices, footer, includeonly indices or None).'
+        key = stat_key(self.path.stat())
+        if self._parts is None or key != self._key:
+            self._parts = self.parse(self.path.read_text())
+            self._key = key
+        return self._parts
+
+    def read(self) -> Tuple[str, list, str]:
+        'Return (header, indices, footer), where indices are the documents in the compiled range.'
+        header, indices, footer, only = self.parts()
+        if only is not None:
+            indices = only
+        return header, list(indices), footer
+
+    def to_index(self, name: str):
+        return self.index_system.DocIndex.from_filename(name.strip())
+
+    def parse(self, text: str) -> Tuple[str, list, str, Optional[list]]:
+        part = 0
+        header: List[str] = []
+        footer: List[str] = []
+        indices = []
+        only = None
+        for line in text.splitlines(keepends=True):
+            # order of if-statements is important here!
+            if 'end lectures' in line:
+                part = 2
+
+            if part == 0:
+                m = INCLUDEONLY_RE.match(line)
+                if m:
+                    only = [self.to_index(name)
+                            for name in m.group(1).split(',') if name.strip()]
+                else:
+                    header.append(line)
+            if part == 1 and '{' in line:
+                indices.append(self.to_index(line.split('{')[1].split('}')[0]))
+            if part == 2:
+                footer.append(line)
+
+            if 'start lectures' in line:
+                part = 1
+        return (''.join(header), indices, ''.join(footer), only)
+
+    def render(self, header: str, indices: list, footer: str, only: list = None) -> str:
+        if self.mode == 'input':
+            body = ''.join(
+                ' ' * 4 + r'\input{' + index.to_filename() + '}\n' for index in indices)
+            return header + body + footer
+
+        body = ''.join(
+            ' ' * 4 + r'\include{' + index.to_filename()[:-len('.tex')] + '}\n' for index in indices)
+        includeonly = r'\includeonly{' + ','.join(
+            index.to_filename()[:-len('.tex')] for index in only) + '}\n'
+        lines = header.splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            if line.strip().startswith(r'\begin{document}'):
+                lines.insert(i, includeonly)
+                break
+        else:
+            raise ValueError(
+                r'No \begin{document} before "% start lectures" in ' + str(self.path))
+        return ''.join(lines) + body + footer
+
+    def write(self, indices: list, all_indices: list = None) -> bool:
+        ''' Include exactly the documents in indices. Return whether the file changed.
+        all_indices are all the documents of the course, which the
+        includeonly mode needs.'''
+        header, current, footer, current_only = self.parts()
+        indices = list(indices)
+        if self.mode == 'input':
+            body, only = indices, None
+        else:
+            if all_indices is None:
+                raise ValueError('The includeonly mode needs all documents')
+            body = list(all_indices)
+            chosen = set(indices)
+            only = [index for index in body if index in chosen]
+        if body == current and only == current_only:
+            return False
+
+        atomic_write_text(self.path, self.render(header, body, footer, only))
+        self._parts = (header, body, footer, only)
+        self._key = stat_key(self.path.stat())
+        return True
@@ -0,0 +1,66 @@
+''' master.tex in both modes: what is written is read back, and it is only
+written when the documents change, by replacing the file.
+'''
+
+from pathlib import Path
+
+import pytest
+
+from lectures import MultiIndexSystem
+from master_file import MasterFile
+
+INDEX = MultiIndexSystem.DocIndex
+
+MASTER = '''\\documentclass{article}
+\\begin{document}
+    % start lectures
+    % end lectures
+\\end{document}
+'''
+
+DOCUMENTS = [INDEX(('lab', 1)), INDEX(('lecture', 1)), INDEX(('lecture', 2))]
+
+
+def master(tmp_path: Path, mode: str) -> MasterFile:
+    (tmp_path / 'master.tex').write_text(MASTER)
+    return MasterFile(tmp_path / 'master.tex', MultiIndexSystem(), mode)
+
+
+def test_input_round_trip(tmp_path):
+    file = master(tmp_path, 'input')
+    assert file.write([DOCUMENTS[2], DOCUMENTS[0]])
+    assert '    \\input{lecture_02.tex}\n    \\input{lab_01.tex}\n' in file.path.read_text()
+    # a new MasterFile parses what was written
+    assert MasterFile(file.path, MultiIndexSystem()).read()[1] == [DOCUMENTS[2], DOCUMENTS[0]]
+
+
+def test_includeonly_round_trip(tmp_path):
+    file = master(tmp_path, 'includeonly')
+    assert file.write([DOCUMENTS[2], DOCUMENTS[1]], DOCUMENTS)
+    text = file.path.read_text()
+    assert '\\includeonly{lecture_01,lecture_02}\n\\begin{document}' in text
+    assert text.count('\\include{') == 3
+    # the range is the includeonly list, in course order
+    header, indices, footer = MasterFile(file.path, MultiIndexSystem()).read()
+    assert indices == [DOCUMENTS[1], DOCUMENTS[2]]
+    assert '\\includeonly' not in header
+
+    with pytest.raises(ValueError):
+        file.write([DOCUMENTS[0]])  # without all documents
+    with pytest.raises(ValueError):
+        MasterFile(file.path, MultiIndexSystem(), 'include')
+
+
+def test_written_only_on_change_by_replacing(tmp_path):
+    file = master(tmp_path, 'input')
+    assert file.write(DOCUMENTS)
+    st = file.path.stat()
+    assert not file.write(DOCUMENTS)
+    assert file.path.stat().st_mtime_ns == st.st_mtime_ns
+
+    reader = file.path.open()  # sees the old content after the rename
+    assert file.write(DOCUMENTS[:1])
+    assert file.path.stat().st_ino != st.st_ino
+    assert reader.read().count('\\input{') == 3
+    reader.close()
+    assert [path.name for path in tmp_path.iterdir()] == ['master.tex']
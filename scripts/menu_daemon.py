@@ -0,0 +1,258 @@
+#!/usr/local/bin/python3
+''' A resident menu daemon for chooses.py.
+
+The daemon keeps one `AllChoicesService` alive, and reads the workspace
+again shortly after anything in it changes. Every request for the options
+collects the menu again, in which only the services whose dependencies
+changed do any work, and services that missed the deadline of an earlier
+request contribute the items they finished meanwhile. chooses.py talks to
+it over a Unix socket: it asks for the options, shows them with `choose`
+itself, and sends the selection back, which the daemon executes. When the
+daemon is not running, chooses.py builds the menu in-process as before.
+
+The protocol is one JSON object per line, one request per connection:
+
+    {"op": "options"}  ->  {"generation": 3, "options": ["Include ...", ...]}
+    {"op": "select", "generation": 3, "returncode": 0, "index": 2, "selected": "..."}
+                       ->  {"ok": true}
+    {"op": "complete", "prompt": "New L"}  ->  {"completions": ["New Lab", "New Lecture"]}
+    {"op": "refresh"}  ->  {"ok": true}
+    {"op": "ping"}     ->  {"ok": true}
+
+Run `python menu_daemon.py` to start the daemon.
+'''
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import MENU_SOCKET, ROOT
+
+# seconds to wait for more filesystem events before building the menu again
+REFRESH_DELAY = 0.5
+# seconds the client waits for the daemon, before falling back to in-process
+CLIENT_TIMEOUT = 10
+# menus kept for selections that arrive after a refresh
+KEPT_MENUS = 8
+
+
+def send(message: dict, path: Path = MENU_SOCKET, timeout: float = CLIENT_TIMEOUT) -> dict:
+    'Send one request to the daemon and return its reply. Raise OSError if the daemon is not reachable.'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        with sock.makefile('rwb') as f:
+            f.write(json.dumps(message).encode() + b'\n')
+            f.flush()
+            line = f.readline()
+    if not line:
+        raise ConnectionError('The menu daemon closed the connection')
+    return json.loads(line)
+
+
+def run_client(path: Path = MENU_SOCKET) -> bool:
+    ''' Show the menu of the daemon, and let it execute the selection.
+    Return False if the daemon is not running.'''
+    try:
+        menu = send({'op': 'options'}, path)
+    except (OSError, ValueError):
+        return False
+
+    from choose import Choose
+    returncode, index, selected = Choose.run('Select option', menu['options'], [])
+    send({'op': 'select', 'generation': menu['generation'],
+          'returncode': getattr(returncode, 'value', returncode),
+          'index': index, 'selected': selected}, path)
+    return True
+
+
+class MenuDaemon():
+    ''' The state of the menu. The services live as long as the current
+    course and its document types do, so that their memoized items and the
+    items of services that missed a deadline carry over between requests.
+    Every request collects the menu again.'''
+
+    def __init__(self, root: Path = ROOT):
+        self.root = root
+        self.generation = 0
+        self.service = None
+        self._layout = None
+        self.menus = OrderedDict()  # generation -> menuitems
+        self._lock = threading.RLock()
+        self._timer = None
+        self._observer = None
+        # actions run one at a time, after the client got its reply
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def build(self):
+        ''' Read the workspace again, create the services again if the
+        current course or its document types changed, and build the menu.'''
+        with self._lock:
+            layout = self.layout()
+            if self.service is None or layout != self._layout:
+                if self.service is not None:
+                    self.service.close()
+                self.service = self.new_service()
+                self._layout = layout
+            # starts the services, so that the next request finds them done
+            self.menu()
+
+    def layout(self):
+        from chooses import services_layout
+        from courses import courses, semesters
+        semesters.refresh()
+        courses.refresh()
+        return services_layout()
+
+    def new_service(self):
+        from chooses import AllChoicesService
+        return AllChoicesService()
+
+    def menu(self) -> int:
+        ''' Collect the menu items of the services, which only rebuilds those
+        whose dependencies changed, and picks up the items of services that
+        missed the deadline of an earlier menu. Return the new generation.'''
+        with self._lock:
+            menuitems = self.service.get_displayed_menuitems()
+            self.generation += 1
+            self.menus[self.generation] = menuitems
+            while len(self.menus) > KEPT_MENUS:
+                self.menus.popitem(last=False)
+            return self.generation
+
+    def schedule_build(self):
+        'Build the menu again once no change happened for REFRESH_DELAY.'
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(REFRESH_DELAY, self.build)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @staticmethod
+    def is_relevant(path: Path) -> bool:
+        'Does a change of path change the menu?'
+        if path.name in ('info.yaml', 'current_course', 'current_semester'):
+            return True
+        return path.suffix == '.tex' and path.name != 'master.tex' and not path.name.startswith('.')
+
+    def on_change(self, kind: str, path: Path, dest_path: Path = None):
+        if self.is_relevant(path) or (dest_path is not None and self.is_relevant(dest_path)):
+            self.schedule_build()
+
+    def watch(self):
+        from vimtex_popup.watch import watch_changes
+        self._observer = watch_changes(self.root, self.on_change, recursive=True)
+
+    # requests
+
+    def options(self) -> dict:
+        with self._lock:
+            if self.service is None:
+                self.build()
+            generation = self.menu()
+            return {'generation': generation,
+                    'options': self.service.options(self.menus[generation])}
+
+    def complete(self, prompt: str) -> dict:
+        with self._lock:
+            if self.service is None:
+                self.build()
+            service = self.service
+        return {'completions': service.complete(prompt)}
+
+    def select(self, generation: int, returncode: int, index: int, selected: str) -> dict:
+        from choose import Choose
+        with self._lock:
+            menuitems = self.menus.get(generation)
+            service = self.service
+        if menuitems is None:
+            # the menu was built again too often since it was shown
+            return {'ok': False, 'error': 'Unknown menu generation {}'.format(generation)}
+        try:
+            returncode = Choose.CODE(returncode)
+        except ValueError:
+            pass
+
+        def execute():
+            try:
+                service.handle_selection(menuitems, returncode, index, selected)
+            except Exception:
+                service.logger.exception('Failed to execute {!r}'.format(selected))
+            self.schedule_build()
+        self.executor.submit(execute)
+        return {'ok': True}
+
+    def handle(self, message: dict) -> dict:
+        op = message.get('op')
+        if op == 'options':
+            return self.options()
+        if op == 'select':
+            return self.select(message['generation'], message['returncode'],
+                               message['index'], message['selected'])
+        if op == 'complete':
+            return self.complete(message['prompt'])
+        if op == 'refresh':
+            self.build()
+            return {'ok': True}
+        if op == 'ping':
+            return {'ok': True}
+        return {'ok': False, 'error': 'Unknown op {!r}'.format(op)}
+
+
+class MenuRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            reply = self.server.menu.handle(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            reply = {'ok': False, 'error': 'Bad request: {}'.format(e)}
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+class MenuServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, menu: MenuDaemon, path: Path = MENU_SOCKET):
+        self.menu = menu
+        self.path = path
+        if path.exists():
+            try:
+                send({'op': 'ping'}, path, timeout=1)
+                raise RuntimeError('The menu daemon is already running on {}'.format(path))
+            except OSError:
+                path.unlink()  # left behind by a daemon that did not stop cleanly
+        old_umask = os.umask(0o077)  # only this user may connect
+        try:
+            super().__init__(str(path), MenuRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def serve(path: Path = MENU_SOCKET, root: Path = ROOT):
+    menu = MenuDaemon(root)
+    menu.build()
+    menu.watch()
+    with MenuServer(menu, path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    serve()
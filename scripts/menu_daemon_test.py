@@ -0,0 +1,79 @@
+''' The menu daemon, with fixed services instead of the workspace. '''
+
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from action import MenuItem, Service
+from chooses import AllChoicesService
+from menu_daemon import MenuDaemon
+
+SCRIPTS = Path(__file__).parent
+
+
+class Slow(Service):
+    'A service that lists its items once it is released.'
+
+    def __init__(self):
+        super().__init__('slow')
+        self.released = threading.Event()
+
+    def suggested_actions(self):
+        self.released.wait(5)
+        return [MenuItem('slow item', 'Slow item')]
+
+
+class FixedMenu(MenuDaemon):
+    def __init__(self, services):
+        super().__init__()
+        self.services = services
+
+    def layout(self):
+        return ()
+
+    def new_service(self):
+        return AllChoicesService(self.services, deadline=0.05)
+
+
+def test_late_services_show_up_in_the_next_menu():
+    slow = Slow()
+    menu = FixedMenu([MenuItem('fast', 'Fast'), slow])
+    first = menu.options()
+    assert first['options'] == ['Fast', 'Slow (loading...)']
+
+    slow.released.set()
+    menu.service.pending[1].result(timeout=5)
+    second = menu.options()
+    assert second['options'] == ['Fast', 'Slow item']
+    assert second['generation'] > first['generation']
+
+
+def test_services_outlive_builds():
+    menu = FixedMenu([MenuItem('fast', 'Fast')])
+    menu.build()
+    service = menu.service
+    menu.build()
+    assert menu.service is service
+
+
+HANGING_SERVICE = '''
+import time
+from action import Service
+from chooses import AllChoicesService
+
+class Hanging(Service):
+    def suggested_actions(self):
+        time.sleep(60)
+
+service = AllChoicesService([Hanging('hanging')], deadline=0.01)
+print([item.display_name for item in service.get_displayed_menuitems()])
+service.close()
+'''
+
+
+def test_hanging_services_do_not_block_the_exit():
+    result = subprocess.run([sys.executable, '-c', HANGING_SERVICE], cwd=str(SCRIPTS),
+                            stdout=subprocess.PIPE, universal_newlines=True, timeout=30)
+    assert result.returncode == 0
+    assert 'Hanging (loading...)' in result.stdout
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Tuple
+
+from config import EXPORT_DIR, EXPORT_HARDLINKS, EXPORT_MANIFEST
+from stat_cache import StatCache
+
+PDF = 'master.pdf'
+
+
+class ExportResult(NamedTuple):
+    source: Path
+    target: Path
+    status: str  # copied, linked, unchanged, missing or failed
+    error: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.status not in ('missing', 'failed')
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open('rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def copy_file(source: Path, target: Path):
+    ''' Copy source to target with os.copy_file_range, which lets the kernel
+    copy, or share the blocks on filesystems that support reflinks. Fall back
+    to shutil.copyfile, which uses sendfile or fcopyfile where it can.'''
+    try:
+        with source.open('rb') as src, target.open('wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        return
+    except (AttributeError, OSError):  # not available on this platform or filesystem
+        pass
+    shutil.copyfile(str(source), str(target))
+
+
+class PDFExport():
+    ''' Export compiled PDFs to a destination directory.
+
+    The content hash of every exported file is kept in a StatCache
+    (EXPORT_MANIFEST), keyed by the stat of the target, and the hash of every
+    source by its own stat. A target that still has the content of its
+    source is left alone. Otherwise the source is copied, or hardlinked if
+    `hardlink` is set and the target is on the same filesystem, to a
+    temporary file that replaces the target.
+
+    Hardlinks are opt-in, because LaTeX rewrites master.pdf in place, which
+    would also change the exported file.'''
+
+    def __init__(self, manifest: Path = EXPORT_MANIFEST, hardlink: bool = EXPORT_HARDLINKS):
+        self.manifest = StatCache(manifest)
+        self.hardlink = hardlink
+
+    def digest(self, path: Path, st: os.stat_result) -> str:
+        name = 'source:' + str(path)
+        digest = self.manifest.get(name, st)
+        if digest is None:
+            digest = file_digest(path)
+            self.manifest.put(name, st, digest)
+        return digest
+
+    def export(self, source: Path, target: Path) -> ExportResult:
+        'Export one file. Never raises.'
+        try:
+            digest = self.digest(source, source.stat())
+        except FileNotFoundError:
+            return ExportResult(source, target, 'missing')
+        try:
+            if self.manifest.get(str(target), target.stat()) == digest:
+                return ExportResult(source, target, 'unchanged')
+        except FileNotFoundError:
+            pass
+
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(target.parent), prefix='.' + target.name + '.')
+            os.close(fd)
+            try:
+                status = 'copied'
+                if self.hardlink:
+                    try:
+                        os.unlink(tmp)
+                        os.link(str(source), tmp)
+                        status = 'linked'
+                    except OSError:  # e.g. another filesystem
+                        pass
+                if status == 'copied':
+                    copy_file(source, Path(tmp))
+                    os.chmod(tmp, 0o644)
+                os.replace(tmp, str(target))
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+            self.manifest.put(str(target), target.stat(), digest)
+            return ExportResult(source, target, status)
+        except OSError as e:
+            return ExportResult(source, target, 'failed', repr(e))
+
+    def export_all(self, pairs: Iterable[Tuple[Path, Path]], jobs: int = None) -> List[ExportResult]:
+        'Export (source, target) pairs concurrently. Return the results in order.'
+        pairs = list(pairs)
+        with ThreadPoolExecutor(max_workers=jobs or min(8, os.cpu_count() or 1)) as pool:
+            results = list(pool.map(lambda pair: self.export(*pair), pairs))
+        self.manifest.save()
+        return results
+
+
+def course_pairs(courses: Iterable, dest: Path) -> List[Tuple[Path, Path]]:
+    'The master.pdf of every course, exported as <course name>.pdf in dest.'
+    return [(course.path / PDF, dest / (course.name + '.pdf')) for course in courses]
+
+
+def export_courses(courses: Iterable, dest: Path = EXPORT_DIR, jobs: int = None,
+                   hardlink: bool = EXPORT_HARDLINKS) -> List[ExportResult]:
+    'Export the PDF of every course to dest.'
+    return PDFExport(hardlink=hardlink).export_all(course_pairs(courses, dest), jobs)
+
+
+def export_semesters(semesters: Iterable, dest: Path = EXPORT_DIR, jobs: int = None,
+                     hardlink: bool = EXPORT_HARDLINKS) -> List[ExportResult]:
+    'Export the PDF of every course of every semester, to one directory per semester in dest.'
+    pairs = []
+    for semester in semesters:
+        pairs += course_pairs(semester.courses, dest / semester.name.replace('/', '-'))
+    return PDFExport(hardlink=hardlink).export_all(pairs, jobs)
@@ -0,0 +1,60 @@
+''' Exporting PDFs: unchanged targets are skipped, the manifest records
+what was exported, and copying falls back when copy_file_range fails.
+'''
+
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+import pdf_export
+from pdf_export import PDFExport, copy_file
+
+
+def export(tmp_path: Path, **kwargs) -> PDFExport:
+    return PDFExport(tmp_path / 'manifest.json', **kwargs)
+
+
+def test_unchanged_targets_are_skipped(tmp_path):
+    source, target = tmp_path / 'master.pdf', tmp_path / 'out' / 'Algebra.pdf'
+    source.write_bytes(b'%PDF one')
+    assert [r.status for r in export(tmp_path).export_all([(source, target)])] == ['copied']
+    assert target.read_bytes() == b'%PDF one'
+
+    # a new PDFExport, as in the next run, reads the manifest
+    assert [r.status for r in export(tmp_path).export_all([(source, target)])] == ['unchanged']
+    source.write_bytes(b'%PDF two')
+    assert [r.status for r in export(tmp_path).export_all([(source, target)])] == ['copied']
+    target.write_bytes(b'edited elsewhere')
+    assert export(tmp_path).export(source, target).status == 'copied'
+    assert target.read_bytes() == b'%PDF two'
+
+    result = export(tmp_path).export(tmp_path / 'missing.pdf', target)
+    assert (result.status, result.ok) == ('missing', False)
+    assert [path.name for path in target.parent.iterdir()] == ['Algebra.pdf']  # no temporary files
+
+
+def test_hardlinks(tmp_path):
+    source, target = tmp_path / 'master.pdf', tmp_path / 'Algebra.pdf'
+    source.write_bytes(b'%PDF one')
+    assert export(tmp_path, hardlink=True).export(source, target).status == 'linked'
+    assert target.stat().st_ino == source.stat().st_ino
+
+
+@pytest.mark.parametrize('failure', ['unsupported', 'missing'])
+def test_copy_falls_back(tmp_path, monkeypatch, failure):
+    source, target = tmp_path / 'master.pdf', tmp_path / 'Algebra.pdf'
+    source.write_bytes(os.urandom(3 << 20))
+    target.write_bytes(b'a longer previous export' * (1 << 18))
+
+    def copy_file_range(src, dst, count):
+        os.write(dst, os.read(src, 1 << 20))  # part of it, before failing
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+    if failure == 'unsupported':
+        monkeypatch.setattr(pdf_export.os, 'copy_file_range', copy_file_range)
+    else:
+        monkeypatch.delattr(pdf_export.os, 'copy_file_range', raising=False)
+
+    copy_file(source, target)
+    assert target.read_bytes() == source.read_bytes()
@@ -0,0 +1,322 @@
+''' The range language of `MultiIndexSystem.match_range`.
+
+A range string is a comma separated list of clauses:
+
+    lecture 1-5, lab 1, homework 2-last, current
+    last lecture, first lab - lecture 4
+    all lecture, all lab, sorted by date desc
+    all lecture, week 5 - 7, sorted by week then title
+
+It is tokenized and parsed once into a small syntax tree (`RangePlan`),
+which is cached by string and then evaluated against an `IndexTable`.
+Sorting and filtering by week need the document metadata, which is given
+as a `DocumentTable`.
+'''
+
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple, Union
+
+from index_table import IndexTable
+
+if TYPE_CHECKING:
+    from document_table import DocumentTable
+
+# position words and the position they stand for
+POSITIONS = {
+    'current': 'last', 'last': 'last', 'latest': 'last',
+    'newest': 'last', 'end': 'last',
+    'first': 'first', 'earliest': 'first', 'oldest': 'first', 'start': 'first',
+    'prev': 'prev', 'previous': 'prev',
+}
+SORT_WORDS = ['sorted', 'sort']
+SORT_KEYS = {'date': 'date', 'time': 'date', 'title': 'title',
+             'week': 'week', 'index': 'index'}
+DIRECTIONS = {'asc': False, 'ascending': False,
+              'desc': True, 'descending': True}
+# words that start or join clauses, and cannot be document types
+KEYWORDS = set(POSITIONS) | set(SORT_WORDS) | {'all', 'week', 'then', 'by'}
+# the type used when neither end of a range names one
+DEFAULT_TYPE = 'lecture'
+
+TOKEN_RE = re.compile(r'\s*(?:(?P<number>\d+)|(?P<word>[a-z]+)|(?P<op>[-,]))')
+
+
+class RangeError(ValueError):
+    'A range string that cannot be resolved against the documents.'
+
+
+class RangeSyntaxError(RangeError):
+    'A range string that cannot be parsed.'
+
+    def __init__(self, message: str, string: str, column: int):
+        self.string = string
+        self.column = column
+        super().__init__('{} at column {}:\n    {}\n    {}^'.format(
+            message, column + 1, string, ' ' * column))
+
+
+class Token(NamedTuple):
+    kind: str  # number, word, - or ,
+    value: Union[str, int]
+    column: int
+
+
+def tokenize(string: str) -> List[Token]:
+    tokens = []
+    pos = 0
+    string = string.rstrip()
+    while pos < len(string):
+        m = TOKEN_RE.match(string, pos)
+        if not m:
+            column = pos + len(string[pos:]) - len(string[pos:].lstrip())
+            raise RangeSyntaxError('Unexpected character {!r}'.format(
+                string[column]), string, column)
+        column = m.start(m.lastgroup)
+        if m.lastgroup == 'number':
+            tokens.append(Token('number', int(m.group('number')), column))
+        elif m.lastgroup == 'word':
+            tokens.append(Token('word', m.group('word'), column))
+        else:
+            tokens.append(Token(m.group('op'), m.group('op'), column))
+        pos = m.end()
+    return tokens
+
+
+# syntax tree
+
+class Endpoint(NamedTuple):
+    'One end of a range, e.g. `lecture 3`, `first lab` or `last`.'
+    type_name: Optional[str]
+    position: Union[int, str]  # a number, or 'first', 'last', 'prev'
+
+    def number(self, type_name: str, table: IndexTable) -> int:
+        if isinstance(self.position, int):
+            return self.position
+        numbers = table.numbers.get(type_name, [])
+        if not numbers:
+            raise RangeError('There is no {} document'.format(type_name))
+        if self.position == 'first':
+            return numbers[0]
+        if self.position == 'prev' and len(numbers) > 1:
+            return numbers[-2]
+        return numbers[-1]
+
+    def resolve(self, index_system, table: IndexTable, type_name: str):
+        try:
+            return index_system.DocIndex((type_name, self.number(type_name, table)))
+        except RangeError:
+            raise
+        except ValueError as e:
+            raise RangeError('Invalid document {} {}: {}'.format(
+                type_name, self.position, e))
+
+
+class Span(NamedTuple):
+    ''' A single document, or all documents between two endpoints.
+    An endpoint without a type takes the type of the other one.'''
+    start: Endpoint
+    end: Optional[Endpoint] = None
+
+    def evaluate(self, index_system, table: IndexTable) -> list:
+        if self.end is None:
+            type_name = self.start.type_name or DEFAULT_TYPE
+            return [self.start.resolve(index_system, table, type_name)]
+
+        start_type = self.start.type_name or self.end.type_name or DEFAULT_TYPE
+        end_type = self.end.type_name or self.start.type_name or DEFAULT_TYPE
+        start = self.start.resolve(index_system, table, start_type)
+        end = self.end.resolve(index_system, table, end_type)
+        if start_type != end_type:
+            for index in (start, end):
+                if index not in table:
+                    raise RangeError('{} {} does not exist, so it cannot end a range across types'.format(
+                        index[0], index[1]))
+        return index_system.range(table, start, end)
+
+
+class All(NamedTuple):
+    'All documents, or all documents of one type.'
+    type_name: Optional[str] = None
+
+    def evaluate(self, index_system, table: IndexTable) -> list:
+        if self.type_name:
+            return list(table.of_type(self.type_name))
+        return list(table)
+
+
+class Sort(NamedTuple):
+    'The order of the result, as a list of (key, descending).'
+    keys: Tuple[Tuple[str, bool], ...]
+
+
+class Weeks(NamedTuple):
+    'Restrict the result to the documents dated in weeks [first, last].'
+    first: int
+    last: int
+
+
+class RangePlan(NamedTuple):
+    ''' A compiled range string: the union of its clauses, restricted to
+    the given weeks and sorted.'''
+    clauses: Tuple[Union[Span, All], ...]
+    sort: Optional[Sort] = None
+    weeks: Optional[Tuple[int, int]] = None
+
+    def evaluate(self, index_system, table: IndexTable, documents: 'DocumentTable' = None) -> list:
+        ''' Resolve the plan against the indices in table. The week filter
+        and the sort are applied with the documents; without them, a week
+        filter is an error and the sort is ignored.'''
+        clauses = self.clauses
+        if not clauses and self.weeks:
+            clauses = (All(),)  # `week 5` alone means all documents in week 5
+
+        result = []
+        for clause in clauses:
+            result.extend(clause.evaluate(index_system, table))
+
+        if self.weeks:
+            if documents is None:
+                raise RangeError('Filtering by week needs the documents')
+            result = documents.filter(result, weeks=self.weeks)
+        if self.sort and documents is not None:
+            result = documents.sort(result, self.sort.keys)
+        return result
+
+
+# parser
+
+class Parser():
+    def __init__(self, string: str):
+        self.string = string
+        self.tokens = tokenize(string)
+        self.pos = 0
+
+    def error(self, message: str, token: Token = None):
+        column = token.column if token else len(self.string.rstrip())
+        raise RangeSyntaxError(message, self.string, column)
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> Optional[Token]:
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def at_clause_end(self) -> bool:
+        token = self.peek()
+        return token is None or token.kind == ','
+
+    def parse(self) -> RangePlan:
+        clauses = []
+        sort = None
+        weeks = None
+        while self.peek() is not None:
+            if self.peek().kind == ',':  # empty clause
+                self.next()
+                continue
+            clause = self.parse_clause()
+            if isinstance(clause, Sort):
+                sort = clause
+            elif isinstance(clause, Weeks):
+                weeks = clause
+            else:
+                clauses.append(clause)
+            if not self.at_clause_end():
+                self.error('Expected "," or the end of the range', self.peek())
+        return RangePlan(tuple(clauses), sort, weeks and (weeks.first, weeks.last))
+
+    def parse_clause(self):
+        token = self.peek()
+        if token.kind == 'word' and token.value in SORT_WORDS:
+            return self.parse_sort()
+        if token.kind == 'word' and token.value == 'week':
+            return self.parse_weeks()
+        if token.kind == 'word' and token.value == 'all':
+            self.next()
+            type_token = None if self.at_clause_end() else self.expect_type()
+            return All(type_token.value if type_token else None)
+
+        # `type all` or a range
+        if (token.kind == 'word' and token.value not in POSITIONS
+                and self.pos + 1 < len(self.tokens)
+                and self.tokens[self.pos + 1].value == 'all'):
+            type_token = self.expect_type()
+            self.next()  # all
+            return All(type_token.value)
+
+        start = self.parse_endpoint()
+        end = None
+        if self.peek() is not None and self.peek().kind == '-':
+            self.next()
+            end = self.parse_endpoint()
+        return Span(start, end)
+
+    def parse_sort(self) -> Sort:
+        self.next()  # sorted
+        if self.peek() is not None and self.peek().value == 'by':
+            self.next()
+        keys = []
+        while True:
+            token = self.next()
+            if token is None or token.kind != 'word' or token.value not in SORT_KEYS:
+                self.error('Expected a sort key ({})'.format(
+                    ', '.join(sorted(SORT_KEYS))), token)
+            descending = False
+            if self.peek() is not None and self.peek().value in DIRECTIONS:
+                descending = DIRECTIONS[self.next().value]
+            keys.append((SORT_KEYS[token.value], descending))
+            # further keys are given as `then <key>`
+            if self.peek() is not None and self.peek().value == 'then':
+                self.next()
+                continue
+            return Sort(tuple(keys))
+
+    def parse_weeks(self) -> 'Weeks':
+        self.next()  # week
+        first = self.next()
+        if first is None or first.kind != 'number':
+            self.error('Expected a week number', first)
+        last = first
+        if self.peek() is not None and self.peek().kind == '-':
+            self.next()
+            last = self.next()
+            if last is None or last.kind != 'number':
+                self.error('Expected a week number', last)
+        return Weeks(first.value, last.value)
+
+    def expect_type(self) -> Token:
+        token = self.next()
+        if token is None or token.kind != 'word' or token.value in KEYWORDS:
+            self.error('Expected a document type', token)
+        return token
+
+    def parse_position(self) -> Union[int, str]:
+        token = self.next()
+        if token is not None and token.kind == 'number':
+            return token.value
+        if token is not None and token.kind == 'word' and token.value in POSITIONS:
+            return POSITIONS[token.value]
+        self.error('Expected a number or a position (first, last, prev)', token)
+
+    def parse_endpoint(self) -> Endpoint:
+        token = self.peek()
+        if token is None or token.kind in ('-', ','):
+            self.error('Expected a document', token)
+        if token.kind == 'number' or token.value in POSITIONS:
+            # `3`, `last` or `last lecture`
+            position = self.parse_position()
+            after = self.peek()
+            if after is not None and after.kind == 'word':
+                return Endpoint(self.expect_type().value, position)
+            return Endpoint(None, position)
+        # `lecture 3`
+        type_name = self.expect_type().value
+        return Endpoint(type_name, self.parse_position())
+
+
+@lru_cache(maxsize=256)
+def compile_range(string: str) -> RangePlan:
+    'Parse a range string into a RangePlan. Raise a RangeSyntaxError if it is invalid.'
+    return Parser(string.lower()).parse()
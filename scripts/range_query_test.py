@@ -0,0 +1,38 @@
+''' The words of the range language. `week` and `then` are keywords since
+the week filter and sorting by several keys; words that only contain a
+keyword, which the string replacements of the old parser mangled, are
+ordinary document types. '''
+
+import pytest
+
+from lectures import MultiIndexSystem
+from range_query import All, RangeSyntaxError, compile_range
+
+
+@pytest.mark.parametrize('word', ['week', 'then'])
+def test_reserved_words_are_not_types(word):
+    assert word in MultiIndexSystem.RESERVED_WORDS
+    with pytest.raises(ValueError):
+        MultiIndexSystem.DocIndex((word, 1))
+    for string in ['all ' + word, word + ' all', 'then 1', 'lecture 1 - then 2']:
+        with pytest.raises(RangeSyntaxError):
+            compile_range(string)
+
+
+def test_reserved_words_as_keywords():
+    assert compile_range('week 3').weeks == (3, 3)
+    assert compile_range('all lab, week 3 - 5').weeks == (3, 5)
+    plan = compile_range('all lecture, sorted by date then title desc')
+    assert plan.sort.keys == (('date', False), ('title', True))
+    with pytest.raises(RangeSyntaxError):
+        compile_range('week lecture')
+
+
+@pytest.mark.parametrize('word', ['weekly', 'recall', 'lastly', 'thenar', 'allocation', 'sorting'])
+def test_words_containing_keywords_are_types(word):
+    MultiIndexSystem.DocIndex((word, 1))
+    assert compile_range('all ' + word).clauses == (All(word),)
+    span, = compile_range(word + ' 1-2').clauses
+    assert span.start.type_name == word
+    indices = [MultiIndexSystem.DocIndex((word, n)) for n in (1, 2, 3)]
+    assert MultiIndexSystem.match_range('{} 2-last'.format(word), indices) == indices[1:]
@@ -0,0 +1,26 @@
+#!/usr/local/bin/python3
+import argparse
+
+from search_index import SearchIndex
+
+parser = argparse.ArgumentParser(
+    description='Maintain and query the full-text index of all documents.')
+commands = parser.add_subparsers(dest='command', required=True)
+commands.add_parser('rebuild', help='index all documents again')
+commands.add_parser('refresh', help='index the documents that changed since the last refresh')
+search = commands.add_parser('search', help='list the documents matching a query')
+search.add_argument('query', nargs='+')
+search.add_argument('-n', '--limit', type=int, default=20)
+args = parser.parse_args()
+
+index = SearchIndex()
+if args.command == 'rebuild':
+    index.rebuild()
+elif args.command == 'refresh':
+    print('{} documents indexed'.format(index.refresh()))
+elif args.command == 'search':
+    index.refresh()
+    for hit in index.search(' '.join(args.query), args.limit):
+        print('{:<20} {:<12} {:>5}  {}'.format(
+            hit.course.name, '{} {}'.format(hit.index[0], hit.index[1]), hit.line, hit.text))
+index.close()
@@ -0,0 +1,250 @@
+import math
+import os
+import re
+import sqlite3
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+from config import ROOT, SEARCH_INDEX
+from lectures import MultiIndexSystem
+from utils import scan_workspace
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    course TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    UNIQUE (course, filename)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term INTEGER NOT NULL,
+    file INTEGER NOT NULL,
+    lines BLOB NOT NULL,
+    PRIMARY KEY (term, file)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file);
+'''
+
+LATEX_TOKEN_RE = re.compile(r'\\(?:[a-zA-Z]+|.)|\$\$?|[^\W\d_]+')
+COMMENT_RE = re.compile(r'(?<!\\)%.*')
+MATH_ENVIRONMENTS = {'equation', 'align', 'alignat', 'gather', 'multline',
+                     'eqnarray', 'displaymath', 'math', 'flalign'}
+# commands that stand for math identifiers, and are indexed by their name
+MATH_IDENTIFIERS = {
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'varepsilon', 'zeta', 'eta',
+    'theta', 'vartheta', 'iota', 'kappa', 'lambda', 'mu', 'nu', 'xi', 'pi',
+    'varpi', 'rho', 'varrho', 'sigma', 'varsigma', 'tau', 'upsilon', 'phi',
+    'varphi', 'chi', 'psi', 'omega', 'Gamma', 'Delta', 'Theta', 'Lambda', 'Xi',
+    'Pi', 'Sigma', 'Upsilon', 'Phi', 'Psi', 'Omega', 'ell', 'infty', 'nabla',
+    'partial'}
+# line numbers are packed into blobs as unsigned ints
+LINE_NUMBER = array('I')
+STOP_WORDS = {
+    'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'if', 'in', 'is', 'it',
+    'let', 'of', 'on', 'or', 'so', 'that', 'the', 'then', 'this', 'to', 'we',
+    'with'}
+
+
+def tokenize_latex(lines: List[str]) -> Iterator[Tuple[str, int]]:
+    ''' Yield the (term, line number) of the words in a LaTeX source.
+    Commands are dropped, except for the names of environments and of greek
+    letters and similar symbols in math. Single letters are only kept in
+    math, where they are identifiers.'''
+    math = False
+    pending = None  # 'begin' or 'end', waiting for the environment name
+    for number, line in enumerate(lines, 1):
+        line = COMMENT_RE.sub('', line)
+        for m in LATEX_TOKEN_RE.finditer(line):
+            token = m.group()
+            if token[0] == '\\':
+                name = token[1:]
+                pending = name if name in ('begin', 'end') else None
+                if name in ('[', '('):
+                    math = True
+                elif name in (']', ')'):
+                    math = False
+                elif math and name in MATH_IDENTIFIERS:
+                    yield name.lower(), number
+            elif token[0] == '$':
+                math = not math
+                pending = None
+            elif pending is not None:
+                if token in MATH_ENVIRONMENTS:
+                    math = pending == 'begin'
+                if pending == 'begin':
+                    yield token.lower(), number
+                pending = None
+            elif math or len(token) > 1:
+                term = token.lower()
+                if term not in STOP_WORDS:
+                    yield term, number
+
+
+def tokenize_query(query: str) -> List[str]:
+    'The terms of a search query. Every word is kept, as if it was written in math.'
+    terms = []
+    for term, _ in tokenize_latex(['$' + query.replace('$', ' ') + '$']):
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+class SearchHit(NamedTuple):
+    course: Path
+    index: object  # MultiIndexSystem.DocIndex
+    line: int
+    score: float
+    text: str  # the matching line
+
+    @property
+    def file_path(self) -> Path:
+        return self.course / self.index.to_filename()
+
+
+class SearchIndex():
+    ''' An inverted index over the text of every document of every course
+    below ROOT, stored in SQLite.
+
+    Every term maps to the documents it occurs in, with the numbers of the
+    lines it occurs on packed into a blob. `refresh` only tokenizes the
+    documents whose mtime or size changed since they were indexed.'''
+
+    index_system = MultiIndexSystem()
+
+    def __init__(self, path: Path = SEARCH_INDEX, root: Path = ROOT):
+        self.path = path
+        self.root = root
+        self.db = sqlite3.connect(str(path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._term_ids: Dict[str, int] = None
+
+    def close(self):
+        self.db.close()
+
+    # indexing
+
+    def documents(self) -> Iterator[Tuple[Path, os.DirEntry]]:
+        'The (course path, directory entry) of every document in the workspace.'
+        for course in scan_workspace(self.root).courses:
+            with os.scandir(course) as entries:
+                for entry in entries:
+                    if self.index_system.is_filename_valid(entry.name):
+                        yield course, entry
+
+    def rebuild(self):
+        'Forget everything and index all documents again.'
+        with self.db:
+            for table in ['postings', 'terms', 'files']:
+                self.db.execute('DELETE FROM {}'.format(table))
+        self._term_ids = None
+        self.refresh()
+
+    def refresh(self) -> int:
+        'Index the documents that changed since the last refresh. Return how many were indexed.'
+        known = {(row['course'], row['filename']): row for row in self.db.execute(
+            'SELECT id, course, filename, mtime_ns, size FROM files')}
+        indexed = 0
+        with self.db:
+            for course, entry in self.documents():
+                st = entry.stat()
+                row = known.pop((str(course), entry.name), None)
+                if row is not None and (row['mtime_ns'], row['size']) == (st.st_mtime_ns, st.st_size):
+                    continue
+                self.index_file(course, Path(entry.path), st, row['id'] if row else None)
+                indexed += 1
+            for row in known.values():  # deleted documents
+                self.db.execute('DELETE FROM postings WHERE file = ?', (row['id'],))
+                self.db.execute('DELETE FROM files WHERE id = ?', (row['id'],))
+        return indexed
+
+    def term_id(self, term: str) -> int:
+        if self._term_ids is None:
+            self._term_ids = {row['term']: row['id'] for row in self.db.execute('SELECT id, term FROM terms')}
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self.db.execute('INSERT INTO terms (term) VALUES (?)', (term,)).lastrowid
+            self._term_ids[term] = term_id
+        return term_id
+
+    def index_file(self, course: Path, path: Path, st: os.stat_result, file_id: int = None):
+        if file_id is None:
+            file_id = self.db.execute(
+                'INSERT INTO files (course, filename, mtime_ns, size) VALUES (?, ?, ?, ?)',
+                (str(course), path.name, st.st_mtime_ns, st.st_size)).lastrowid
+        else:
+            self.db.execute('DELETE FROM postings WHERE file = ?', (file_id,))
+            self.db.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?',
+                            (st.st_mtime_ns, st.st_size, file_id))
+
+        with path.open(encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+        occurrences: Dict[str, array] = {}
+        for term, number in tokenize_latex(lines):
+            occurrences.setdefault(term, array(LINE_NUMBER.typecode)).append(number)
+        self.db.executemany('INSERT INTO postings VALUES (?, ?, ?)', [
+            (self.term_id(term), file_id, numbers.tobytes()) for term, numbers in occurrences.items()])
+
+    # queries
+
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        ''' The documents that contain the terms of the query, best first,
+        with the line that contains the most of them.
+
+        A document is scored by the sum over the query terms of
+        log(1 + occurrences) * idf, so rare terms count more, and a
+        document that contains every term ranks before one that does not.'''
+        terms = tokenize_query(query)
+        n_files = self.db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+        scores: Dict[int, float] = {}
+        blobs: Dict[int, List[bytes]] = {}  # the line numbers of each matched term, by file
+        for term in terms:
+            postings = self.db.execute(
+                '''SELECT postings.file, postings.lines FROM postings
+                   JOIN terms ON postings.term = terms.id WHERE terms.term = ?''', (term,)).fetchall()
+            if not postings:
+                continue
+            idf = math.log(1 + n_files / len(postings))
+            for file_id, blob in postings:
+                occurrences = len(blob) // LINE_NUMBER.itemsize
+                scores[file_id] = scores.get(file_id, 0) + math.log(1 + occurrences) * idf
+                blobs.setdefault(file_id, []).append(blob)
+
+        ranked = sorted(scores, key=lambda file_id: (-len(blobs[file_id]), -scores[file_id]))[:limit]
+        hits = []
+        for file_id in ranked:
+            course, filename = self.db.execute(
+                'SELECT course, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+            line = self.best_line(blobs[file_id])
+            hits.append(SearchHit(Path(course), self.index_system.DocIndex.from_filename(filename),
+                                  line, scores[file_id], self.line_text(Path(course) / filename, line)))
+        return hits
+
+    @staticmethod
+    def best_line(blobs: List[bytes]) -> int:
+        'The first of the lines on which the most of the terms occur.'
+        terms_on_line: Dict[int, int] = {}
+        for blob in blobs:
+            numbers = array(LINE_NUMBER.typecode)
+            numbers.frombytes(blob)
+            for number in set(numbers):
+                terms_on_line[number] = terms_on_line.get(number, 0) + 1
+        return min(terms_on_line, key=lambda number: (-terms_on_line[number], number))
+
+    @staticmethod
+    def line_text(path: Path, line: int) -> str:
+        try:
+            with path.open(encoding='utf-8', errors='replace') as f:
+                for number, text in enumerate(f, 1):
+                    if number == line:
+                        return text.strip()
+        except FileNotFoundError:
+            pass
+        return ''
@@ -0,0 +1,53 @@
+''' Tokenizing LaTeX, and searching the documents of a small workspace.
+'''
+
+from pathlib import Path
+
+from search_index import SearchIndex, tokenize_latex, tokenize_query
+
+
+def terms(source: str) -> list:
+    return list(tokenize_latex(source.splitlines()))
+
+
+def test_tokenize_latex():
+    assert terms('The \\textbf{Sylow} theorems % of groups\n') == [('sylow', 1), ('theorems', 1)]
+    # single letters and greek letters only in math
+    assert terms('a map $f: G \\to H$ with \\alpha') == [('map', 1), ('f', 1), ('g', 1), ('h', 1)]
+    assert terms('\\[ \\alpha x \\]') == [('alpha', 1), ('x', 1)]
+    # environment names, and math environments
+    assert terms('\\begin{theorem}\nlet\n\\begin{align}\nx\n\\end{align}\ny') == [
+        ('theorem', 1), ('align', 3), ('x', 4)]
+    assert tokenize_query('Sylow p $\\alpha$ sylow') == ['sylow', 'p', 'alpha']
+
+
+def write(course: Path, filename: str, text: str):
+    course.mkdir(parents=True, exist_ok=True)
+    (course / 'info.yaml').write_text('title: {}\n'.format(course.name))
+    (course / filename).write_text(text)
+
+
+def test_search_ranking(tmp_path):
+    root = tmp_path / 'univ'
+    algebra = root / '2024' / 'fall' / 'algebra'
+    write(algebra, 'lecture_01.tex', 'Groups\n\nThe Sylow theorems for a group $G$.\nSylow subgroups\n')
+    write(algebra, 'lecture_02.tex', 'Rings\n\nEvery field is a ring.\nGroups of units\n')
+    write(root / '2024' / 'fall' / 'topology', 'lecture_01.tex', 'Fundamental groups\n')
+    index = SearchIndex(tmp_path / 'search.sqlite', root)
+    assert index.refresh() == 3
+    assert index.refresh() == 0
+
+    hits = index.search('sylow group')
+    assert [(hit.file_path.parent.name, hit.index.to_filename()) for hit in hits][0] == \
+        ('algebra', 'lecture_01.tex')
+    assert (hits[0].line, hits[0].text) == (3, 'The Sylow theorems for a group $G$.')
+    # a document that contains every term first, then by score
+    assert [hit.file_path.name for hit in index.search('groups ring')][0] == 'lecture_02.tex'
+    assert index.search('galois') == []
+
+    # only the edited document is indexed again
+    (algebra / 'lecture_02.tex').write_text('Galois theory\n')
+    (root / '2024' / 'fall' / 'topology' / 'lecture_01.tex').unlink()
+    assert index.refresh() == 1
+    assert [hit.line for hit in index.search('galois')] == [1]
+    assert [hit.file_path.parent.name for hit in index.search('groups')] == ['algebra']
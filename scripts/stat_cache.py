@@ -0,0 +1,94 @@
+import atexit
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils import atomic_write_text
+
+
+def stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    'The (inode, size, mtime_ns) triple that identifies one version of a file.'
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class StatCache():
+    ''' A persistent cache of values derived from files.
+    Every entry is stored under a name together with the stat key of the file
+    it was derived from, and is only returned while the file still has the
+    same (inode, size, mtime_ns). The cache lives in a single JSON file.'''
+
+    VERSION = 1
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._save_registered = False
+        self._entries: Dict[str, list] = self._load()
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            data = json.loads(self.cache_file.read_text())
+            if data['version'] == self.VERSION:
+                return data['entries']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # a missing or corrupted cache is an empty cache
+        return {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name: str):
+        return name in self._entries
+
+    def get(self, name: str, st: os.stat_result) -> Optional[Any]:
+        'Return the value stored for name if it is still valid for st, otherwise None.'
+        entry = self._entries.get(name)
+        if entry is not None and tuple(entry[0]) == stat_key(st):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, name: str, st: os.stat_result, value: Any):
+        self._entries[name] = [list(stat_key(st)), value]
+        self._dirty = True
+
+    def discard(self, name: str):
+        if self._entries.pop(name, None) is not None:
+            self._dirty = True
+
+    def prune(self, names: Iterable[str]):
+        'Drop the entries whose name is not in names, e.g. of deleted files.'
+        names = set(names)
+        for name in [n for n in self._entries if n not in names]:
+            self.discard(name)
+
+    def save(self):
+        'Write the cache to disk if it has changed. Failing to write is not an error.'
+        if not self._dirty:
+            return
+        try:
+            atomic_write_text(self.cache_file, json.dumps(
+                {'version': self.VERSION, 'entries': self._entries}))
+            self._dirty = False
+        except OSError:
+            pass
+
+    def save_at_exit(self):
+        'Save the cache when the interpreter exits, so that many updates cost one write.'
+        if not self._save_registered:
+            atexit.register(self.save)
+            self._save_registered = True
+
+    def invalidate(self):
+        'Forget all entries, both in memory and on disk.'
+        self._entries = {}
+        self._dirty = False
+        self.cache_file.unlink(missing_ok=True)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
@@ -0,0 +1,44 @@
+''' StatCache entries are valid while the stat of their file is unchanged,
+and survive a round trip through the cache file.
+'''
+
+import os
+from pathlib import Path
+
+from stat_cache import StatCache
+
+
+def test_a_changed_file_invalidates(tmp_path):
+    path = tmp_path / 'lecture_01.tex'
+    path.write_text('one')
+    cache = StatCache(tmp_path / 'cache.json')
+    cache.put('lecture_01.tex', path.stat(), 'parsed one')
+    assert cache.get('lecture_01.tex', path.stat()) == 'parsed one'
+
+    # the same size, only the mtime differs
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert cache.get('lecture_01.tex', path.stat()) is None
+    path.write_text('a longer one')
+    assert cache.get('lecture_01.tex', path.stat()) is None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'entries': 1}
+
+
+def test_saved_and_loaded(tmp_path):
+    path, cache_file = tmp_path / 'lecture_01.tex', tmp_path / 'cache.json'
+    path.write_text('one')
+    cache = StatCache(cache_file)
+    cache.put('lecture_01.tex', path.stat(), ['lecture', 1])
+    cache.put('lecture_02.tex', path.stat(), ['lecture', 2])
+    cache.prune(['lecture_01.tex'])
+    cache.save()
+    assert StatCache(cache_file).get('lecture_01.tex', path.stat()) == ['lecture', 1]
+    assert 'lecture_02.tex' not in StatCache(cache_file)
+
+    # a corrupted or outdated cache is empty
+    cache_file.write_text('{"version": 0, "entries": {}}')
+    assert len(StatCache(cache_file)) == 0
+    cache_file.write_text('not json')
+    assert len(StatCache(cache_file)) == 0
+    cache.invalidate()
+    assert not Path(cache_file).exists() and len(cache) == 0
@@ -1,5 +1,7 @@
+import os
+import tempfile
 from pathlib import Path
-from typing import Generator, List
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 
 def beautify(string):
@@ -21,11 +23,58 @@ def generate_short_title(title):
     return short_title
 
 
-def recursive_iterdir(path: Path) -> Generator[Path, None, None]:
-    for entry in path.iterdir():
-        if entry.is_dir():
-            yield entry
-            yield from recursive_iterdir(entry)
+# directories that never contain courses. hidden directories are skipped too
+PRUNED_DIRECTORIES = {'figures', 'UltiSnips', '__pycache__', '_minted', 'build'}
+
+
+class WorkspaceScan(NamedTuple):
+    semesters: Dict[Path, List[Path]]  # every semester, with its courses
+    courses: List[Path]
+    directories: List[Path]  # the directories that were listed, except courses
+
+
+def _scan_directory(path: str) -> Tuple[List[os.DirEntry], Set[str]]:
+    'Return the subdirectories and the names of the files in path, with a single scandir.'
+    dirs = []
+    files = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            # DirEntry caches the file type, so this costs no extra stat
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry)
+            else:
+                files.add(entry.name)
+    return dirs, files
+
+
+def scan_workspace(root: Path) -> WorkspaceScan:
+    ''' Find all semesters and courses below root, in one pass.
+    A course is a directory with an info.yaml; its contents are not scanned.
+    A semester is a directory with a course in it, or an empty directory
+    with a preamble.tex and no master.tex. Symlinks are not followed.'''
+    semesters: Dict[Path, List[Path]] = {}
+    courses: List[Path] = []
+    directories: List[Path] = []
+
+    def walk(path: Path, dirs: List[os.DirEntry], files: Set[str], is_root: bool):
+        directories.append(path)
+        child_courses = []
+        for entry in dirs:
+            if entry.name in PRUNED_DIRECTORIES or entry.name.startswith('.'):
+                continue
+            sub_dirs, sub_files = _scan_directory(entry.path)
+            if 'info.yaml' in sub_files:
+                child_courses.append(Path(entry.path))
+            else:
+                walk(Path(entry.path), sub_dirs, sub_files, False)
+        courses.extend(child_courses)
+        if is_root:
+            return
+        if child_courses or (not dirs and 'preamble.tex' in files and 'master.tex' not in files):
+            semesters[path] = child_courses
+
+    walk(root, *_scan_directory(str(root)), True)
+    return WorkspaceScan(semesters, courses, directories)
 
 
 def cut_string(string, max_length) -> List[str]:
@@ -36,3 +85,59 @@ def cut_string(string, max_length) -> List[str]:
         string = string[max_length:]
     pieces.append(string)
     return pieces
+
+
+def atomic_write_text(path: Path, text: str):
+    'Write text to path through a temporary file and a rename, so readers never see a half-written file.'
+    fd, tmp = tempfile.mkstemp(
+        dir=str(path.parent), prefix='.' + path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        try:
+            os.chmod(tmp, path.stat().st_mode)  # keep the mode of the old file
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, str(path))
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def file_key(path: Path) -> Optional[Tuple[int, int]]:
+    'The (st_dev, st_ino) identity of the file at path, following symlinks, or None if it does not exist.'
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+class SymlinkTarget():
+    ''' The identity of the target of a symlink, such as the current course
+    symlink. The target is only resolved again when the symlink itself
+    changes, which is detected from its lstat: replacing the symlink gives it
+    a new inode and mtime.'''
+
+    def __init__(self, link: Path):
+        self.link = link
+        self._link_key = None
+        self._key = None
+
+    def key(self) -> Optional[Tuple[int, int]]:
+        'The (st_dev, st_ino) of the target, or None if the symlink or its target does not exist.'
+        try:
+            st = os.lstat(self.link)
+            link_key = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            link_key = None
+        if link_key is None or link_key != self._link_key:
+            self._link_key = link_key
+            self._key = file_key(self.link) if link_key is not None else None
+        return self._key
+
+    def is_target(self, key: Optional[Tuple[int, int]]) -> bool:
+        return key is not None and key == self.key()
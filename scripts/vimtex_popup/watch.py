@@ -28,6 +28,30 @@ class MyHandler(FileSystemEventHandler):
 
             
 
+class ChangeHandler(FileSystemEventHandler):
+    'Forward every file that is created, deleted, modified or moved to callback(kind, path, dest_path).'
+
+    def __init__(self, callback) -> None:
+        super().__init__()
+        self.callback = callback
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ('created', 'deleted', 'modified', 'moved'):
+            return None
+        dest_path = getattr(event, 'dest_path', None)
+        self.callback(event.event_type, Path(event.src_path),
+                      Path(dest_path) if dest_path else None)
+
+
+def watch_changes(path:Path, callback, recursive=False) -> Observer:
+    'Call callback(kind, path, dest_path) for every change below path, until the returned observer is stopped.'
+    observer = Observer()
+    observer.daemon = True
+    observer.schedule(ChangeHandler(callback), str(path), recursive=recursive)
+    observer.start()
+    return observer
+
+
 def watch(path:Path, callback, final_callback):
     watching_folder = path.parent
     name = path.name
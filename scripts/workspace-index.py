@@ -0,0 +1,34 @@
+#!/usr/local/bin/python3
+import argparse
+
+from workspace_index import WorkspaceIndex
+
+parser = argparse.ArgumentParser(
+    description='Maintain and query the index of all semesters, courses and documents.')
+commands = parser.add_subparsers(dest='command', required=True)
+commands.add_parser('rebuild', help='index the whole workspace again')
+refresh = commands.add_parser('refresh', help='index what changed since the last refresh')
+refresh.add_argument('--files', action='store_true',
+                     help='also look for documents edited in place')
+commands.add_parser('courses', help='list the indexed courses')
+documents = commands.add_parser('documents', help='list the indexed documents')
+documents.add_argument('--type', dest='type_name')
+documents.add_argument('--week', type=int)
+args = parser.parse_args()
+
+index = WorkspaceIndex()
+if args.command == 'rebuild':
+    index.rebuild()
+elif args.command == 'refresh':
+    index.refresh(check_files=args.files)
+elif args.command == 'courses':
+    index.refresh()
+    for row in index.query_courses():
+        print('{:<30} {:<10} {}'.format(row['name'], row['short'] or '', row['semester'] or ''))
+elif args.command == 'documents':
+    index.refresh()
+    weeks = (args.week, args.week) if args.week is not None else None
+    for row in index.query_documents(type_name=args.type_name, weeks=weeks):
+        print('{:<30} {:<10} {:>3}  week {:>2}  {}'.format(
+            row['course_name'], row['type'], row['number'], row['week'], row['title']))
+index.close()
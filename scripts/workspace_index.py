@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from config import ROOT, WORKSPACE_INDEX
+from lectures import Lecture, Lectures, MultiIndexSystem
+from stat_cache import stat_key
+from utils import scan_workspace
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS semesters (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS courses (
+    path TEXT PRIMARY KEY,
+    semester TEXT,
+    name TEXT NOT NULL,
+    title TEXT,
+    short TEXT,
+    url TEXT,
+    info TEXT NOT NULL,
+    info_key TEXT,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS documents (
+    course TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    type TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    date TEXT,
+    title TEXT,
+    week INTEGER,
+    stat_key TEXT,
+    PRIMARY KEY (course, filename)
+);
+CREATE INDEX IF NOT EXISTS courses_semester ON courses (semester);
+CREATE INDEX IF NOT EXISTS documents_week ON documents (week, type);
+'''
+
+
+class WorkspaceIndex():
+    ''' A persistent SQLite index of the semesters, courses (with their
+    info.yaml) and documents (with their defline) below ROOT.
+
+    `refresh` brings it up to date incrementally: the workspace is only
+    walked again when the mtime of a directory that was walked changed, and
+    the documents of a course are only listed again when the mtime of the
+    course directory changed. Documents edited in place do not change the
+    directory mtime; `refresh(check_files=True)` also compares the stat of
+    every document.'''
+
+    index_system = MultiIndexSystem()
+
+    def __init__(self, path: Path = WORKSPACE_INDEX, root: Path = ROOT):
+        self.path = path
+        self.root = root
+        self.db = sqlite3.connect(str(path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # refreshing
+
+    @staticmethod
+    def mtime_ns(path: Path) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return -1
+
+    def structure_changed(self) -> bool:
+        rows = self.db.execute('SELECT path, mtime_ns FROM directories').fetchall()
+        return not rows or any(self.mtime_ns(Path(row['path'])) != row['mtime_ns'] for row in rows)
+
+    def rebuild(self):
+        'Forget everything and index the workspace again.'
+        with self.db:
+            for table in ['directories', 'semesters', 'courses', 'documents']:
+                self.db.execute('DELETE FROM {}'.format(table))
+        self.refresh(check_files=True)
+
+    def refresh(self, check_files: bool = False):
+        'Bring the index up to date with the workspace.'
+        with self.db:
+            if self.structure_changed():
+                self.refresh_structure()
+            for row in self.db.execute('SELECT path, info_key, mtime_ns FROM courses').fetchall():
+                self.refresh_course(Path(row['path']), row, check_files)
+
+    def refresh_structure(self):
+        scan = scan_workspace(self.root)
+        self.db.execute('DELETE FROM directories')
+        self.db.executemany('INSERT INTO directories VALUES (?, ?)',
+                            [(str(path), self.mtime_ns(path)) for path in scan.directories])
+
+        self.db.execute('DELETE FROM semesters')
+        self.db.executemany('INSERT INTO semesters VALUES (?, ?)', [
+            (str(path), path.parent.stem + '/' + path.stem) for path in scan.semesters])
+
+        semester_of = {course: semester for semester, courses in scan.semesters.items()
+                       for course in courses}
+        known = {row['path'] for row in self.db.execute('SELECT path FROM courses')}
+        found = {str(path) for path in scan.courses}
+        for path in known - found:
+            self.db.execute('DELETE FROM courses WHERE path = ?', (path,))
+            self.db.execute('DELETE FROM documents WHERE course = ?', (path,))
+        for path in scan.courses:
+            semester = semester_of.get(path)
+            self.db.execute('''INSERT INTO courses (path, semester, name, info) VALUES (?, ?, ?, '{}')
+                               ON CONFLICT (path) DO UPDATE SET semester = excluded.semester''',
+                            (str(path), str(semester) if semester else None, path.stem))
+
+    def refresh_course(self, path: Path, row: sqlite3.Row, check_files: bool):
+        info_file = path / 'info.yaml'
+        try:
+            key = json.dumps(stat_key(info_file.stat()))
+        except FileNotFoundError:
+            return
+        if key != row['info_key']:
+            import yaml
+            with info_file.open() as f:
+                info = yaml.safe_load(f) or {}
+            self.db.execute('''UPDATE courses SET title = ?, short = ?, url = ?, info = ?, info_key = ?
+                               WHERE path = ?''',
+                            (info.get('title'), info.get('short'), info.get('url'),
+                             json.dumps(info, default=str), key, str(path)))
+
+        mtime_ns = self.mtime_ns(path)
+        if mtime_ns == row['mtime_ns'] and not check_files:
+            return
+        self.refresh_documents(path)
+        self.db.execute('UPDATE courses SET mtime_ns = ? WHERE path = ?',
+                        (mtime_ns, str(path)))
+
+    def refresh_documents(self, path: Path):
+        'List the documents of a course again, and parse the ones whose stat changed.'
+        known = {row['filename']: row['stat_key'] for row in self.db.execute(
+            'SELECT filename, stat_key FROM documents WHERE course = ?', (str(path),))}
+        found = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if self.index_system.is_filename_valid(entry.name):
+                    found[entry.name] = json.dumps(stat_key(entry.stat()))
+
+        for filename in known.keys() - found.keys():
+            self.db.execute('DELETE FROM documents WHERE course = ? AND filename = ?',
+                            (str(path), filename))
+        for filename, key in found.items():
+            if known.get(filename) == key:
+                continue
+            lecture = Lecture(path / filename, self.index_system)
+            index, date, title, week = lecture.info
+            self.db.execute('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (str(path), filename, index[0], index[1], date, title, week,
+                             json.dumps(stat_key(lecture.file_path.stat()))))
+
+    # loading
+
+    def semesters(self) -> list:
+        from courses import Semester
+        course_paths: Dict[str, List[Path]] = {}
+        for row in self.db.execute('SELECT path, semester FROM courses WHERE semester IS NOT NULL'):
+            course_paths.setdefault(row['semester'], []).append(Path(row['path']))
+        return [Semester(Path(row['path']), course_paths.get(row['path'], []))
+                for row in self.db.execute('SELECT path FROM semesters ORDER BY name')]
+
+    def courses(self, semester: Path = None) -> list:
+        'The courses of a semester, or of the whole workspace.'
+        from courses import Course
+        return [Course(Path(row['path']), json.loads(row['info']))
+                for row in self.query_courses(semester)]
+
+    def lectures(self, course: Path, **kwargs) -> Lectures:
+        documents = [
+            Lecture(Path(course) / row['filename'], self.index_system,
+                    [(row['type'], row['number']), row['date'], row['title'], row['week']])
+            for row in self.query_documents(course=course)]
+        return Lectures(Path(course), self.index_system, documents=documents, **kwargs)
+
+    # queries
+
+    def indexed_path(self, table: str, path: Path) -> str:
+        'The indexed path of a semester or course, which may be given through a symlink.'
+        if self.db.execute('SELECT 1 FROM {} WHERE path = ?'.format(table), (str(path),)).fetchone():
+            return str(path)
+        resolved = Path(path).resolve()
+        for row in self.db.execute('SELECT path FROM {}'.format(table)):
+            if Path(row['path']).resolve() == resolved:
+                return row['path']
+        return str(path)
+
+    def semester_key(self, semester: Path) -> str:
+        return self.indexed_path('semesters', semester)
+
+    def course_key(self, course: Path) -> str:
+        return self.indexed_path('courses', course)
+
+    def query_courses(self, semester: Path = None) -> List[sqlite3.Row]:
+        if semester is None:
+            return self.db.execute('SELECT * FROM courses ORDER BY name').fetchall()
+        return self.db.execute('SELECT * FROM courses WHERE semester = ? ORDER BY name',
+                               (self.semester_key(semester),)).fetchall()
+
+    def query_documents(self, course: Path = None, semester: Path = None, type_name: str = None,
+                        weeks: Tuple[int, int] = None) -> List[sqlite3.Row]:
+        'The documents matching all of the given conditions, sorted by course and index.'
+        conditions, args = [], []
+        if course is not None:
+            conditions.append('documents.course = ?')
+            args.append(self.course_key(course))
+        if semester is not None:
+            conditions.append('courses.semester = ?')
+            args.append(self.semester_key(semester))
+        if type_name is not None:
+            conditions.append('documents.type = ?')
+            args.append(type_name)
+        if weeks is not None:
+            conditions.append('documents.week BETWEEN ? AND ?')
+            args += list(weeks)
+        return self.db.execute(
+            '''SELECT documents.*, courses.name AS course_name, courses.semester AS semester
+               FROM documents JOIN courses ON documents.course = courses.path
+               {} ORDER BY documents.course, documents.type, documents.number'''.format(
+                'WHERE ' + ' AND '.join(conditions) if conditions else ''),
+            args).fetchall()
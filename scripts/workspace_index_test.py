@@ -0,0 +1,68 @@
+''' The workspace index of a small workspace below tmp_path, with the
+current semester and course reached through symlinks as in ~/univ.
+'''
+
+from pathlib import Path
+
+from workspace_index import WorkspaceIndex
+
+
+def write_course(semester: Path, name: str, lectures: list) -> Path:
+    course = semester / name
+    course.mkdir(parents=True)
+    (course / 'info.yaml').write_text('title: {}\nshort: {}\n'.format(name.title(), name[:3]))
+    for number in lectures:
+        (course / 'lecture_{:02}.tex'.format(number)).write_text(
+            '\\lecture{{{}}}{{Mon 0{} Jan 2024 10:00}}{{Lecture {}}}\n'.format(number, number, number))
+    return course
+
+
+def workspace(tmp_path: Path) -> WorkspaceIndex:
+    root = tmp_path / 'univ'
+    write_course(root / '2024' / 'fall', 'algebra', [1, 2])
+    write_course(root / '2024' / 'fall', 'topology', [1])
+    (root / 'current_semester').symlink_to(root / '2024' / 'fall')
+    (root / 'current_course').symlink_to(root / 'current_semester' / 'algebra')
+    return WorkspaceIndex(tmp_path / 'index.sqlite', root)
+
+
+def test_queries_through_the_symlinks(tmp_path):
+    index = workspace(tmp_path)
+    index.refresh()
+    root = index.root
+
+    assert [course.name for course in index.courses(root / 'current_semester')] == ['algebra', 'topology']
+    assert len(index.query_documents(semester=root / 'current_semester')) == 3
+
+    rows = index.query_documents(course=root / 'current_course')
+    assert [row['filename'] for row in rows] == ['lecture_01.tex', 'lecture_02.tex']
+    assert [row['filename'] for row in index.query_documents(
+        course=root / 'current_semester' / 'topology')] == ['lecture_01.tex']
+    assert len(index.lectures(root / 'current_course')) == 2
+
+
+def test_refresh_follows_the_changes(tmp_path):
+    index = workspace(tmp_path)
+    index.refresh()
+    root = index.root
+    algebra = root / '2024' / 'fall' / 'algebra'
+    assert [row['week'] for row in index.query_documents(weeks=(0, 52))]  # parsed deflines
+    assert index.query_courses()[0]['title'] == 'Algebra'
+
+    # a new document, and a new course
+    (algebra / 'lecture_03.tex').write_text('\\lecture{3}{Mon 15 Jan 2024 10:00}{Fields}\n')
+    write_course(root / '2024' / 'fall', 'analysis', [1])
+    index.refresh()
+    assert [course.name for course in index.courses()] == ['algebra', 'analysis', 'topology']
+    assert index.query_documents(course=algebra)[-1]['title'] == 'Fields'
+
+    # a document edited in place does not change the directory
+    (algebra / 'lecture_03.tex').write_text('\\lecture{3}{Mon 15 Jan 2024 10:00}{Galois theory}\n')
+    index.refresh(check_files=True)
+    assert index.query_documents(course=algebra)[-1]['title'] == 'Galois theory'
+
+    (algebra / 'lecture_01.tex').unlink()
+    index.refresh()
+    assert [row['number'] for row in index.query_documents(course=algebra, type_name='lecture')] == [2, 3]
+    index.rebuild()
+    assert len(index.query_documents()) == 4